@@ -4,48 +4,109 @@ monkey.patch_all()
 from dotenv import load_dotenv
 load_dotenv()
 
+import logging
+import time
 from datetime import datetime
 
 from flask import Flask
 
 from config import Config
-from main.db import db
-from main.socketio_ext import socketio
+from main import instrumentation, json as json_ext, metrics, profiler, tracing
+from main.db import db, engine_options
+from main.migrations import check_schema, db_cli
+from main.socketio_ext import init_socketio, socketio
+from rooms.state_cache import room_state_cache
+from rooms.service import membership_cache
+from rooms.presence import init_presence, start_heartbeat
+from rooms.scheduler import timer_scheduler
 
 from main import main_bp
-from auth import auth_bp
+from auth import auth_bp, hashing
 from rooms import rooms_bp
+from stats import stats_bp
 
 import rooms.sockets
 
 from models.user import User
-from models.focus import FocusSession, FocusLog 
+from models.focus import (
+    FocusSession,
+    FocusLog,
+    UserDailyFocus,
+    RoomUserDailyFocus,
+    FocusSessionArchive,
+    FocusLogArchive,
+)
+
+
+logger = logging.getLogger("focusbuddy")
 
 
 def create_app() -> Flask:
+    """
+    Build the app without side effects beyond config: no DDL, no
+    background greenlets, no pool threads. Safe to run once in a
+    preloading gunicorn master and fork.
+    """
+    started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
 
     # init extensions
     db.init_app(app)
-    socketio.init_app(app)
+    instrumentation.init_app(app)
+    metrics.init_app(app)
+    tracing.init_app(app)
+    hashing.init_app(app)
+    json_ext.init_app(app)
+    init_socketio(app)
+    room_state_cache.init_app(app)
+    membership_cache.configure(
+        max_size=app.config["MEMBERSHIP_CACHE_SIZE"],
+        ttl=app.config["MEMBERSHIP_CACHE_TTL"],
+    )
+    init_presence(app)
+    timer_scheduler.init_app(app)
 
     # blueprints
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(rooms_bp)
+    app.register_blueprint(stats_bp)
+    app.cli.add_command(db_cli)
 
     @app.context_processor
     def inject_globals():
-        return {"year": datetime.now().year}
+        return {
+            "year": datetime.now().year,
+            "socketio_msgpack": app.config["SOCKETIO_SERIALIZER"] == "msgpack",
+        }
 
-    with app.app_context():
-        db.create_all()
+    # schema changes run as a separate step (`flask db upgrade`)
+    if app.config["SCHEMA_CHECK"]:
+        check_schema(app)
 
+    logger.info("app ready in %.0f ms", (time.perf_counter() - started) * 1000)
     return app
 
 
+def start_background_tasks(app: Flask) -> None:
+    """Per-worker greenlets; call after fork (see gunicorn.conf.py)."""
+    start_heartbeat(app)
+    room_state_cache.start_listener(app)
+    metrics.start_refresher(app)
+    profiler.install_signal_handler(app)
+    if app.config["TIMER_SCHEDULER_ENABLED"]:
+        timer_scheduler.start()
+
+
 app = create_app()
 
 if __name__ == "__main__":
+    from main.migrations import upgrade
+
+    # dev server: single process, migrate in place
+    with app.app_context():
+        upgrade()
+    start_background_tasks(app)
     socketio.run(app, host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from gevent.threadpool import ThreadPool
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from main.tracing import span
+
+# Werkzeug's scrypt/pbkdf2 run in OpenSSL with the GIL released, so a few
+# native threads take them off the gevent hub; greenlets wait cooperatively
+# and socket timers keep ticking during a login burst.
+# The pool is created on first use so its threads live in the worker
+# process, never in a preloading gunicorn master.
+_pool: Optional[ThreadPool] = None
+_pool_size = 4
+_method = "scrypt:32768:8:1"
+# what hashes made with _method start with; short forms like "scrypt" or
+# "pbkdf2:sha256" are stored with their defaults spelled out
+_prefix: Optional[str] = None
+
+
+def init_app(app) -> None:
+    global _pool, _pool_size, _method, _prefix
+    _method = app.config["PASSWORD_HASH_METHOD"]
+    _pool_size = app.config["PASSWORD_HASH_POOL_SIZE"]
+    _pool = None
+    _prefix = None
+
+
+def _run(fn, *args, **kwargs):
+    global _pool
+    with span("hash", fn.__name__):
+        if _pool_size <= 0:
+            return fn(*args, **kwargs)
+        if _pool is None:
+            _pool = ThreadPool(_pool_size)
+        return _pool.apply(fn, args, kwargs)
+
+
+def hash_password(password: str) -> str:
+    return _run(generate_password_hash, password, method=_method)
+
+
+def check_password(pw_hash: str, password: str) -> bool:
+    return _run(check_password_hash, pw_hash, password)
+
+
+def _canonical_prefix() -> str:
+    # worked out once (lazily, so app start stays cheap) by hashing a
+    # throwaway password the same way real ones are
+    global _prefix
+    if _prefix is None:
+        _prefix = hash_password("x").split("$", 1)[0]
+    return _prefix
+
+
+def needs_rehash(pw_hash: str) -> bool:
+    """True when the stored hash was made with another method/cost."""
+    return pw_hash.split("$", 1)[0] != _canonical_prefix()
@@ -5,10 +5,10 @@ from flask import render_template, request, redirect, url_for, flash, session
 from . import auth_bp
 from .service import (
     find_user_by_login_identifier,
-    find_user_by_username,
-    find_user_by_email,
     create_user,
     verify_password,
+    remember_username,
+    DuplicateUserError,
 )
 
 
@@ -34,6 +34,7 @@ def login_post():
     session.permanent = True
     session["user_id"] = user.id
     session["username"] = user.username
+    remember_username(user.id, user.username)
 
     flash("Logged in successfully ✅", "success")
     if next_url:
@@ -71,16 +72,15 @@ def register_post():
         flash("Passwords do not match.", "error")
         return redirect(url_for("auth.register_page"))
 
-    if find_user_by_username(username):
-        flash("Username already exists.", "error")
+    try:
+        user = create_user(username, email, password)
+    except DuplicateUserError as e:
+        if e.field == "email":
+            flash("Email already exists.", "error")
+        else:
+            flash("Username already exists.", "error")
         return redirect(url_for("auth.register_page"))
 
-    if find_user_by_email(email):
-        flash("Email already exists.", "error")
-        return redirect(url_for("auth.register_page"))
-
-    user = create_user(username, email, password)
-
     session.permanent = True
     session["user_id"] = user.id
     session["username"] = user.username
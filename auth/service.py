@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from werkzeug.security import generate_password_hash, check_password_hash
+from typing import Dict, Iterable
 
+from sqlalchemy.exc import IntegrityError
+
+from main.cache import LRUCache, MISSING
 from main.db import db
 from models.user import User
+from .hashing import hash_password, check_password, needs_rehash
 
 
 def find_user_by_username(username: str):
@@ -14,32 +18,104 @@ def find_user_by_email(email: str):
     return User.query.filter_by(email=email).first()
 
 
+# user id -> username. Usernames never change, so no TTL; seeded on login,
+# registration and socket room joins so presence lookups rarely miss.
+username_cache = LRUCache(max_size=65536)
+
+
+def remember_username(user_id: int, username: str) -> None:
+    username_cache.set(user_id, username)
+
+
+def get_usernames(user_ids: Iterable[int]) -> Dict[int, str]:
+    """Resolve ids to usernames from the cache; misses cost one IN query."""
+    names: Dict[int, str] = {}
+    missing = []
+    for uid in user_ids:
+        name = username_cache.get(uid)
+        if name is MISSING:
+            missing.append(uid)
+        else:
+            names[uid] = name
+
+    if missing:
+        rows = db.session.query(User.id, User.username).filter(User.id.in_(missing)).all()
+        for uid, name in rows:
+            username_cache.set(uid, name)
+            names[uid] = name
+
+    return names
+
+
+class DuplicateUserError(Exception):
+    def __init__(self, field: str):
+        super().__init__(f"{field} already exists")
+        self.field = field  # "username" | "email"
+
+
 def find_user_by_login_identifier(identifier: str):
-    """Identifier can be username OR email."""
-    ident = (identifier or "").strip()
+    """
+    Identifier can be username OR email. One indexed query: emails are
+    stored lowercased (unique index on email), usernames are matched via
+    the lower(username) functional index.
+    """
+    ident = (identifier or "").strip().lower()
     if not ident:
         return None
 
-    # if looks like email, try email first
-    if "@" in ident:
-        user = User.query.filter(db.func.lower(User.email) == ident.lower()).first()
-        if user:
-            return user
+    by_username = db.func.lower(User.username) == ident
+    if "@" not in ident:
+        return User.query.filter(by_username).first()
+
+    # looks like an email: an email match wins over a username match
+    by_email = User.email == ident
+    return (
+        User.query
+        .filter(db.or_(by_email, by_username))
+        .order_by(db.case((by_email, 0), else_=1))
+        .first()
+    )
+
 
-    # fallback username
-    return User.query.filter(db.func.lower(User.username) == ident.lower()).first()
+def _duplicate_field(e: IntegrityError) -> str:
+    # Postgres names the violated index (ix_users_email / ix_users_username);
+    # its message also quotes the value, which may itself contain "email"
+    diag = getattr(e.orig, "diag", None)
+    constraint = getattr(diag, "constraint_name", None)
+    if constraint:
+        return "email" if "email" in constraint else "username"
+    # SQLite: "UNIQUE constraint failed: users.email"
+    return "email" if "users.email" in str(e.orig) else "username"
 
 
 def create_user(username: str, email: str, password: str) -> User:
+    """
+    Relies on the unique indexes instead of looking the user up first;
+    raises DuplicateUserError naming the taken field.
+    """
     user = User(
         username=username.strip(),
         email=email.strip().lower(),
-        password_hash=generate_password_hash(password),
+        password_hash=hash_password(password),
     )
     db.session.add(user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        raise DuplicateUserError(_duplicate_field(e)) from e
+    remember_username(user.id, user.username)
     return user
 
 
 def verify_password(user: User, password: str) -> bool:
-    return check_password_hash(user.password_hash, password)
\ No newline at end of file
+    if not check_password(user.password_hash, password):
+        return False
+
+    # hash cost changed since this password was stored: upgrade it now,
+    # the only moment we have the plaintext
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+        db.session.commit()
+
+    return True
\ No newline at end of file
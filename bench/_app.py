@@ -0,0 +1,106 @@
+"""
+Shared setup for benchmarks.
+
+make_app() is a minimal app + DB (no sockets, no background greenlets).
+It DROPS AND RECREATES every table of the database it is given. Point
+BENCH_DATABASE_URL only at a throwaway database: anything other than
+SQLite under the temp directory, or a Postgres database whose name
+contains "bench", "scratch" or "test", is refused unless the script is
+run with --i-know.
+
+Scripts that drive the real app call use_app_env() before `import app`
+(which monkey-patches gevent), so nothing heavy is imported at the top
+of this module.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+
+SCRATCH_NAMES = ("bench", "scratch", "test")
+
+
+def _temp_sqlite(prefix: str) -> str:
+    return "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix=f"focusbuddy-{prefix}-"), f"{prefix}.db")
+
+
+def use_app_env(prefix: str, bench_database: bool = True) -> None:
+    """
+    Point `import app` at a scratch database (BENCH_DATABASE_URL when set
+    and `bench_database`, else a temp SQLite file), with the timer
+    scheduler, the startup schema check and presence coalescing off.
+    The script migrates the database itself.
+    """
+    url = os.getenv("BENCH_DATABASE_URL") if bench_database else None
+    os.environ["DATABASE_URL"] = url or _temp_sqlite(prefix)
+    os.environ.setdefault("TIMER_SCHEDULER_ENABLED", "0")
+    os.environ.setdefault("SCHEMA_CHECK", "0")
+    os.environ.setdefault("PRESENCE_COALESCE_MS", "0")
+
+
+def add_scratch_argument(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "--i-know", action="store_true",
+        help="allow wiping a BENCH_DATABASE_URL that does not look like a scratch database",
+    )
+
+
+def is_scratch_database(database_url: str) -> bool:
+    from sqlalchemy.engine import make_url
+
+    url = make_url(database_url)
+    name = url.database or ""
+    if url.get_backend_name() == "sqlite":
+        if not name or name == ":memory:":
+            return True
+        return os.path.abspath(name).startswith(os.path.abspath(tempfile.gettempdir()) + os.sep)
+    return any(hint in name.lower() for hint in SCRATCH_NAMES)
+
+
+def make_app(database_url: str | None = None, i_know: bool = False):
+    from flask import Flask
+    from sqlalchemy.engine import make_url
+
+    from main.db import db
+
+    # register every table on db.metadata
+    import models.user  # noqa
+    import models.focus  # noqa
+    import rooms.models  # noqa
+
+    if not database_url:
+        database_url = os.getenv("BENCH_DATABASE_URL") or _temp_sqlite("bench")
+
+    if not i_know and not is_scratch_database(database_url):
+        raise SystemExit(
+            f"refusing to drop all tables of {make_url(database_url).render_as_string(hide_password=True)}: "
+            "use a scratch database (see bench/_app.py) or pass --i-know"
+        )
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed_users(count: int, start: int = 1, prefix: str = "User", password_hash: str = "x",
+               batch_size: int = 50_000) -> None:
+    """
+    Bulk-insert users <prefix><i> / <prefix, lowercased><i>@example.com for
+    i in [start, start + count), batch by batch. The caller commits.
+    """
+    from main.db import db
+    from models.user import User
+
+    end = start + count
+    for first in range(start, end, batch_size):
+        db.session.execute(db.insert(User), [
+            {"username": f"{prefix}{i}", "email": f"{prefix.lower()}{i}@example.com", "password_hash": password_hash}
+            for i in range(first, min(first + batch_size, end))
+        ])
@@ -0,0 +1,68 @@
+"""
+Worker cold-start time.
+
+    python -m bench.cold_start [--runs 5]
+
+Each run is a fresh interpreter doing what a gunicorn master does with
+preload_app: import the app module (monkey patching, imports,
+create_app() and the schema-version check). Prints the median time to
+the first request being servable, with the in-process create_app() time
+it logs. Run it against a migrated database, e.g.
+
+    DATABASE_URL=sqlite:////tmp/fb.db flask --app app db upgrade
+    DATABASE_URL=sqlite:////tmp/fb.db python -m bench.cold_start
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import logging, time
+t0 = time.perf_counter()
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+import app
+app.app.test_client().get("/login")
+print("total_ms=%.1f" % ((time.perf_counter() - t0) * 1000))
+"""
+
+
+def run_once() -> tuple[float, float, float]:
+    t0 = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = (time.perf_counter() - t0) * 1000
+    text = out.stdout + out.stderr
+    total = float(re.search(r"total_ms=([\d.]+)", text).group(1))
+    ready = re.search(r"app ready in (\d+) ms", text)
+    return wall, total, float(ready.group(1)) if ready else float("nan")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("set DATABASE_URL to a migrated database (see module docstring)")
+
+    runs = [run_once() for _ in range(args.runs)]
+    wall, total, ready = (statistics.median(col) for col in zip(*runs))
+    print(f"runs={args.runs}  process wall {wall:.0f} ms  "
+          f"import+first request {total:.0f} ms  create_app {ready:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+timer:update latency during a burst of logins.
+
+    python -m bench.login_burst [--logins 40] [--pool-sizes 0,4]
+
+A ticker greenlet emits a timer:update to a room every 50 ms and records
+how late each tick fires; meanwhile N greenlets log in concurrently.
+Pool size 0 hashes inline on the hub (the old behaviour), >0 uses the
+native thread pool from auth.hashing.
+"""
+from __future__ import annotations
+
+from ._app import use_app_env
+
+use_app_env("login", bench_database=False)
+
+import app as app_module  # noqa: E402  (patches gevent, must come after env)
+
+import argparse  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+
+from auth import hashing  # noqa: E402
+from main.migrations import upgrade  # noqa: E402
+from main.socketio_ext import socketio  # noqa: E402
+
+TICK = 0.05
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def run(app, logins: int, pool_size: int):
+    app.config["PASSWORD_HASH_POOL_SIZE"] = pool_size
+    hashing.init_app(app)
+
+    lateness = []
+    stop = False
+
+    def ticker():
+        expected = time.perf_counter() + TICK
+        while not stop:
+            gevent.sleep(max(0.0, expected - time.perf_counter()))
+            lateness.append(time.perf_counter() - expected)
+            socketio.emit("timer:update", {"room_id": 1, "status": "running"}, to="room:1")
+            expected += TICK
+
+    def login():
+        app.test_client().post("/login", data={"identifier": "bench", "password": "secret123"})
+
+    t = gevent.spawn(ticker)
+    gevent.sleep(TICK * 4)
+    started = time.perf_counter()
+    gevent.joinall([gevent.spawn(login) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop = True
+    t.join()
+    return lateness, elapsed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logins", type=int, default=40)
+    ap.add_argument("--pool-sizes", default="0,4")
+    args = ap.parse_args()
+
+    app = app_module.app
+    with app.app_context():
+        upgrade()
+    app.test_client().post("/register", data={
+        "username": "bench", "email": "bench@example.com",
+        "password": "secret123", "confirm": "secret123",
+    })
+
+    print(f"{args.logins} concurrent logins, timer:update every {TICK * 1000:.0f} ms")
+    print(f"{'pool':>5} {'burst s':>8} {'tick p50 ms':>12} {'p99 ms':>8} {'max ms':>8}")
+    for size in (int(x) for x in args.pool_sizes.split(",")):
+        late, elapsed = run(app, args.logins, size)
+        print(
+            f"{size:>5} {elapsed:>8.2f} {percentile(late, .5) * 1000:>12.1f} "
+            f"{percentile(late, .99) * 1000:>8.1f} {max(late) * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Login lookup cost at 1M users.
+
+    python -m bench.login_lookup [--users 1000000]
+
+Seeds N users, then times find_user_by_login_identifier (one indexed
+query) against the previous lookup (lower(email), then lower(username);
+lower(email) is never index-backed), and prints the query plans.
+Set BENCH_DATABASE_URL to run against Postgres instead of SQLite; all
+of that database's tables are dropped first (see bench/_app.py).
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from sqlalchemy import text
+
+from auth.service import find_user_by_login_identifier
+from main.db import db
+from models.user import User
+
+from ._app import add_scratch_argument, make_app, seed_users
+
+REPEAT = 200
+
+
+def seed(n: int) -> None:
+    seed_users(n, start=0)
+    db.session.commit()
+
+
+def old_lookup(ident: str):
+    ident = ident.strip()
+    if "@" in ident:
+        user = User.query.filter(db.func.lower(User.email) == ident.lower()).first()
+        if user:
+            return user
+    return User.query.filter(db.func.lower(User.username) == ident.lower()).first()
+
+
+def timed(fn, idents) -> float:
+    t0 = time.perf_counter()
+    for ident in idents:
+        fn(ident)
+    return (time.perf_counter() - t0) / len(idents) * 1000
+
+
+def explain(sql: str, **params) -> str:
+    dialect = db.session.get_bind().dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    rows = db.session.execute(text(prefix + sql), params).all()
+    return "\n    ".join(str(r[-1]) for r in rows)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=1_000_000)
+    add_scratch_argument(ap)
+    args = ap.parse_args()
+
+    app = make_app(i_know=args.i_know)
+    with app.app_context():
+        t0 = time.perf_counter()
+        seed(args.users)
+        print(f"seeded {args.users} users in {time.perf_counter() - t0:.1f}s")
+
+        rnd = random.Random(1)
+        emails = [f"USER{rnd.randrange(args.users)}@example.com" for _ in range(REPEAT)]
+        names = [f"user{rnd.randrange(args.users)}" for _ in range(REPEAT)]
+        repeat_old = max(1, REPEAT // 20)
+
+        print(f"{'lookup':<10} {'new ms':>8} {'old ms':>9}")
+        print(f"{'email':<10} {timed(find_user_by_login_identifier, emails):>8.3f} "
+              f"{timed(old_lookup, emails[:repeat_old]):>9.3f}")
+        print(f"{'username':<10} {timed(find_user_by_login_identifier, names):>8.3f} "
+              f"{timed(old_lookup, names[:repeat_old]):>9.3f}")
+
+        print("plan (new, email):\n    " + explain(
+            "SELECT id FROM users WHERE email = :i OR lower(username) = :i", i="user1@example.com"))
+        print("plan (old, email):\n    " + explain(
+            "SELECT id FROM users WHERE lower(email) = :i", i="user1@example.com"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Socket event latency vs. DB pool size under gevent.
+
+    python -m bench.pool_latency [--rooms 200] [--sizes 1,2,5,10,20] [--rtt 2]
+
+For each pool size the app's engine is swapped for one with exactly that
+many connections (no overflow). Then the owners of N rooms all fire
+timer:start and then timer:pause at the same moment, through Socket.IO
+test clients and the real handlers (membership checks, row lock,
+commit, broadcast). Prints percentiles of each event's round-trip (emit
+until its timer:update arrives), plus the pool's own wait/timeout
+counters.
+
+Pool size only matters on Postgres (BENCH_DATABASE_URL, migrated in
+place; the rooms and users it adds are left behind), where greenlets
+yield on every round-trip. --rtt adds that many ms of network latency
+per statement there. On SQLite statements never yield, so the events
+run one after another and every pool size looks the same.
+"""
+from __future__ import annotations
+
+import sys
+
+from ._app import use_app_env
+
+use_app_env("pool")
+
+import app as app_module  # noqa: E402  (patches gevent, must come after env)
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+from gevent.event import Event  # noqa: E402
+from sqlalchemy import create_engine, event as sa_event  # noqa: E402
+
+from main import db as db_module  # noqa: E402
+from main.db import InstrumentedQueuePool, PoolStats, db, engine_options  # noqa: E402
+from main.migrations import upgrade  # noqa: E402
+from main.socketio_ext import socketio  # noqa: E402
+from models.user import User  # noqa: E402
+from rooms.service import create_room  # noqa: E402
+
+from ._app import seed_users  # noqa: E402
+
+EVENTS = ("timer:start", "timer:pause")
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def use_pool(app, size: int, timeout: float, rtt: float) -> None:
+    """Replace the app's engine with a `size`-connection pool."""
+    with app.app_context():
+        db.session.remove()
+        old = db.engine
+        options = engine_options(app.config)
+        options.update(
+            poolclass=InstrumentedQueuePool, pool_size=size, max_overflow=0, pool_timeout=timeout,
+        )
+        engine = create_engine(old.url, **options)
+        if rtt:
+            # network latency per statement, paid while holding the connection
+            sa_event.listen(engine, "before_cursor_execute", lambda *a: gevent.sleep(rtt))
+        db.engines[None] = engine  # the live per-app mapping
+        old.dispose()
+    db_module.pool_stats = PoolStats()
+
+
+def setup(app, rooms: int):
+    """One owner per room, so events only share the pool, not a row lock."""
+    prefix = f"pool{random.randint(1000, 9999)}_"
+    with app.app_context():
+        seed_users(rooms, prefix=prefix)
+        db.session.commit()
+        owners = db.session.execute(
+            db.select(User.id).where(User.username.like(f"{prefix}%")).order_by(User.id)
+        ).scalars().all()
+        room_ids = [create_room(owner_id=uid, name=f"Pool room {uid}").id for uid in owners]
+        db.session.remove()
+
+    clients = []
+    for uid, room_id in zip(owners, room_ids):
+        http = app.test_client()
+        with http.session_transaction() as sess:
+            sess["user_id"] = uid
+        client = socketio.test_client(app, flask_test_client=http)
+        client.emit("room:join", {"room_id": room_id})
+        client.get_received()
+        clients.append((client, room_id))
+    return clients
+
+
+def run(clients) -> tuple[dict, int, int]:
+    """Returns event -> round-trips, errors, missing timer:update."""
+    latencies = {name: [] for name in EVENTS}
+    errors = missing = 0
+    go = Event()
+
+    def owner(client, room_id):
+        nonlocal errors, missing
+        go.wait()
+        for name in EVENTS:
+            t0 = time.perf_counter()
+            try:
+                client.emit(name, {"room_id": room_id, "minutes": 25})
+            except Exception:  # noqa: BLE001  (pool timeout inside the handler)
+                errors += 1
+                continue
+            if not any(m["name"] == "timer:update" for m in client.get_received()):
+                missing += 1
+                continue
+            latencies[name].append(time.perf_counter() - t0)
+
+    greenlets = [gevent.spawn(owner, c, room_id) for c, room_id in clients]
+    gevent.sleep(0)
+    go.set()
+    gevent.joinall(greenlets)
+    return latencies, errors, missing
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rooms", type=int, default=200, help="concurrent room owners")
+    ap.add_argument("--sizes", default="1,2,5,10,20")
+    ap.add_argument("--timeout", type=float, default=10)
+    ap.add_argument("--rtt", type=float, default=2, help="ms added per statement (Postgres only)")
+    args = ap.parse_args()
+    logging.getLogger("focusbuddy.db").setLevel(logging.ERROR)
+
+    app = app_module.app
+    with app.app_context():
+        upgrade()
+        dialect = db.engine.dialect.name
+    rtt = args.rtt / 1000 if dialect == "postgresql" else 0.0
+
+    clients = setup(app, args.rooms)
+    print(f"{args.rooms} owners x {', '.join(EVENTS)}, {dialect}, rtt {rtt * 1000:.1f} ms")
+    print(f"{'pool':>5} {'event':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'waits':>6} {'max wait ms':>12} {'timeouts':>9}")
+
+    failed = False
+    for size in (int(x) for x in args.sizes.split(",")):
+        use_pool(app, size, args.timeout, rtt)
+        latencies, errors, missing = run(clients)
+        stats = db_module.pool_stats
+        for name in EVENTS:
+            lat = latencies[name]
+            print(
+                f"{size:>5} {name:<12} {percentile(lat, .5) * 1000:>8.1f} "
+                f"{percentile(lat, .95) * 1000:>8.1f} {percentile(lat, .99) * 1000:>8.1f} "
+                f"{stats.waits:>6} {stats.max_wait * 1000:>12.1f} {stats.timeouts:>9}"
+            )
+        if errors or missing:
+            failed = True
+            print(f"      {errors} event(s) failed, {missing} without a timer:update")
+
+    for client, _ in clients:
+        client.disconnect()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
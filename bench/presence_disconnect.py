@@ -0,0 +1,45 @@
+"""
+Disconnect cost vs. number of active rooms.
+
+    python -m bench.presence_disconnect
+
+Fills the in-memory presence store with N rooms (a few users each), then
+times disconnecting sockets that joined a single room. With the sid index
+the per-disconnect cost should stay flat as N grows.
+"""
+from __future__ import annotations
+
+import time
+
+from rooms.presence import MemoryPresence
+
+USERS_PER_ROOM = 5
+SAMPLES = 2000
+
+
+def run(n_rooms: int) -> float:
+    p = MemoryPresence(ttl=60)
+    uid = 0
+    for rid in range(n_rooms):
+        for _ in range(USERS_PER_ROOM):
+            uid += 1
+            p.join(f"bg-{uid}", rid, uid)
+
+    sids = [f"s-{i}" for i in range(SAMPLES)]
+    for i, sid in enumerate(sids):
+        p.join(sid, i % n_rooms, 10_000_000 + i)
+
+    t0 = time.perf_counter()
+    for sid in sids:
+        p.disconnect(sid)
+    return (time.perf_counter() - t0) / SAMPLES * 1e6
+
+
+def main() -> None:
+    print(f"{'rooms':>10} {'us/disconnect':>14}")
+    for n in (100, 1_000, 10_000, 100_000):
+        print(f"{n:>10} {run(n):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
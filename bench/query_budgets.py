@@ -0,0 +1,183 @@
+"""
+DB round-trip budget check for hot routes and socket events.
+
+    python -m bench.query_budgets
+
+Drives every budgeted endpoint/event (see main.instrumentation.QUERY_BUDGETS)
+against a scratch SQLite database, both with cold and warm caches, and
+exits non-zero if any of them needs more round-trips than its budget.
+Meant to run in CI so regressions in these paths fail the build.
+
+Also checks that ending a session costs the same number of statements
+with hundreds of people in the room as with one (focus logs and rollups
+are bulk writes, not one per participant).
+"""
+from __future__ import annotations
+
+import logging
+import sys
+
+from ._app import use_app_env
+
+use_app_env("budget")
+
+import app as app_module  # noqa: E402  (must come after the env setup)
+
+from sqlalchemy import event  # noqa: E402
+
+from main.db import db  # noqa: E402
+from main.instrumentation import QUERY_BUDGETS, logger  # noqa: E402
+from main.migrations import upgrade  # noqa: E402
+from main.socketio_ext import socketio  # noqa: E402
+from models.focus import FocusLog  # noqa: E402
+from rooms.models import Room  # noqa: E402
+from rooms.presence import get_presence  # noqa: E402
+from rooms.service import membership_cache  # noqa: E402
+from rooms.sessions_service import end_session, start_session  # noqa: E402
+from rooms.state_cache import room_state_cache  # noqa: E402
+
+CROWD = 300
+
+
+class _Recorder(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.seen = {}
+
+    def emit(self, record):
+        if record.msg != "%s %s":
+            return
+        name, header = record.args
+        fields = dict(kv.split("=") for kv in header.split(";"))
+        trips = int(fields["queries"]) + int(fields["commits"])
+        self.seen[name] = max(self.seen.get(name, 0), trips)
+
+
+def _register(client, name):
+    client.post("/register", data={
+        "username": name, "email": f"{name}@example.com",
+        "password": "secret123", "confirm": "secret123",
+    })
+
+
+def scenario(app) -> None:
+    owner, member = app.test_client(), app.test_client()
+    _register(owner, "owner")
+    _register(member, "member")
+
+    r = owner.post("/rooms/create", data={"name": "Budget room", "with_code": "on"})
+    room_id = int(r.headers["Location"].rstrip("/").split("/")[-1])
+    with app.app_context():
+        code = db.session.get(Room, room_id).join_code
+    member.post("/rooms/join", data={"code": code})
+
+    for cold in (True, False):
+        if cold:
+            membership_cache.clear()
+            room_state_cache.clear()
+
+        for c in (owner, member):
+            c.get("/rooms")
+            c.get(f"/rooms/{room_id}")
+            c.get(f"/rooms/{room_id}/members")
+            c.get(f"/rooms/{room_id}/session")
+            c.get(f"/rooms/{room_id}/presence")
+            c.get("/stats/history")
+            c.get(f"/stats/rooms/{room_id}/leaderboard")
+
+        so = socketio.test_client(app, flask_test_client=owner)
+        sm = socketio.test_client(app, flask_test_client=member)
+        so.emit("room:join", {"room_id": room_id})
+        sm.emit("room:join", {"room_id": room_id})
+        so.emit("timer:start", {"room_id": room_id, "minutes": 25})
+        so.emit("timer:pause", {"room_id": room_id})
+        so.emit("timer:resume", {"room_id": room_id})
+        so.emit("timer:end", {"room_id": room_id})
+        so.emit("timer:start", {"room_id": room_id, "minutes": 25})
+        so.emit("timer:start", {"room_id": room_id, "minutes": 25})
+        so.emit("timer:reset", {"room_id": room_id})
+        sm.emit("room:leave", {"room_id": room_id})
+        sm.disconnect()
+        so.disconnect()
+
+    owner.post(f"/rooms/{room_id}/session/start", data={"minutes": "10"})
+
+
+def _statements_to_end(room_id: int, owner_id: int, present: int) -> int:
+    """Statements `end_session` runs with `present` users in the room."""
+    presence = get_presence()
+    sids = [f"crowd-{room_id}-{uid}" for uid in range(1, present + 1)]
+    for uid, sid in enumerate(sids, 1):
+        presence.join(sid, room_id, uid)
+
+    start_session(room_id, owner_id, 1500)
+    count = 0
+
+    def listener(*args):
+        nonlocal count
+        count += 1
+
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        snap = end_session(room_id, owner_id)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+        for sid in sids:
+            presence.disconnect(sid)
+
+    logs = db.session.execute(
+        db.select(db.func.count(FocusLog.id)).where(FocusLog.session_id == snap.id)
+    ).scalar()
+    if logs != present:
+        raise AssertionError(f"{present} users present, {logs} focus logs written")
+    return count
+
+
+def participants_check(app) -> bool:
+    with app.app_context():
+        room = Room(name="Crowd room", owner_id=1)
+        db.session.add(room)
+        db.session.commit()
+        room_id = room.id
+        alone = _statements_to_end(room_id, 1, 1)
+        crowd = _statements_to_end(room_id, 1, CROWD)
+        db.session.remove()
+
+    ok = crowd == alone
+    print(f"{'end_session statements':<32} {'1 user':>11} {alone:>7}")
+    print(f"{'':<32} {f'{CROWD} users':>11} {crowd:>7}" + ("" if ok else "  GROWS WITH PARTICIPANTS"))
+    return ok
+
+
+def main() -> int:
+    app = app_module.app
+    with app.app_context():
+        upgrade()
+
+    rec = _Recorder()
+    logger.addHandler(rec)
+    logger.setLevel(logging.DEBUG)
+
+    scenario(app)
+
+    failed = False
+    print(f"{'endpoint / event':<32} {'round-trips':>11} {'budget':>7}")
+    for name, budget in QUERY_BUDGETS.items():
+        used = rec.seen.get(name)
+        mark = ""
+        if used is None:
+            mark = "  (not exercised)"
+            failed = True
+        elif used > budget:
+            mark = "  OVER BUDGET"
+            failed = True
+        print(f"{name:<32} {'-' if used is None else used:>11} {budget:>7}{mark}")
+
+    print()
+    if not participants_check(app):
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
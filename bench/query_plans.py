@@ -0,0 +1,199 @@
+"""
+Query-plan regression check for the hot session and member queries.
+
+    python -m bench.query_plans [-v]
+
+Seeds a scratch database (SQLite, or BENCH_DATABASE_URL for Postgres;
+its tables are dropped first, see bench/_app.py),
+runs the real service functions while capturing the SQL they emit, then
+EXPLAINs each statement and checks that it is answered from the index
+designed for it, without a full table scan or a separate sort step.
+Exits non-zero when any query regresses; meant to run in CI next to
+bench.query_budgets.
+
+On Postgres, sequential scans are disabled for the EXPLAIN so a small
+seeded table cannot hide a missing index.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from sqlalchemy import event
+
+from main.db import db
+from models.focus import FocusSession
+from rooms.models import Room, RoomMember
+
+from ._app import add_scratch_argument, make_app, seed_users
+
+ROOMS = 300
+SESSIONS_PER_ROOM = 40
+BIG_ROOM_MEMBERS = 2000
+
+# (name, call, table, index that must serve it, whether a sort step is fine)
+CHECKS: List[Tuple[str, Callable[[], object], str, str, bool]] = []
+
+
+def check(table: str, index: str, sort_ok: bool = False):
+    def decorator(fn):
+        CHECKS.append((fn.__name__, fn, table, index, sort_ok))
+        return fn
+    return decorator
+
+
+# the partial index yields at most a couple of rows per room, which the
+# planner may sort instead of walking the index backwards
+@check("focus_sessions", "ix_focus_sessions_active", sort_ok=True)
+def get_active_session():
+    from rooms.sessions_service import get_active_session
+    return get_active_session(7)
+
+
+@check("focus_sessions", "ix_focus_sessions_room_created")
+def get_latest_session():
+    from rooms.sessions_service import get_latest_session
+    return get_latest_session(7)
+
+
+@check("room_members", "ix_room_members_room_joined")
+def get_room_members_first_page():
+    from rooms.service import get_room_members
+    return get_room_members(db.session.get(Room, 1), limit=50)
+
+
+@check("room_members", "ix_room_members_room_joined")
+def get_room_members_next_page():
+    from rooms.service import decode_cursor, get_room_members
+    room = db.session.get(Room, 1)
+    _, cursor = get_room_members(room, limit=50)
+    db.session.rollback()
+    return get_room_members(room, limit=50, after=decode_cursor(cursor))
+
+
+# the page itself is sorted (rows come in membership order); the per-room
+# latest-status subquery must not be
+@check("focus_sessions", "ix_focus_sessions_room_created", sort_ok=True)
+def get_user_rooms_status():
+    from rooms.service import get_user_rooms
+    return get_user_rooms(1)
+
+
+def seed() -> None:
+    rnd = random.Random(3)
+    now = datetime.utcnow()
+    seed_users(BIG_ROOM_MEMBERS)
+    db.session.execute(db.insert(Room), [{"name": f"Room {r}", "owner_id": 1} for r in range(1, ROOMS + 1)])
+    db.session.execute(db.insert(RoomMember), [
+        {"room_id": 1, "user_id": u, "joined_at": now - timedelta(seconds=rnd.randint(0, 10 ** 7))}
+        for u in range(1, BIG_ROOM_MEMBERS + 1)
+    ] + [{"room_id": r, "user_id": 1} for r in range(2, ROOMS + 1)])
+
+    sessions = []
+    for r in range(1, ROOMS + 1):
+        for k in range(SESSIONS_PER_ROOM):
+            created = now - timedelta(hours=k)
+            sessions.append({
+                "room_id": r, "started_by": 1, "duration_seconds": 1500, "paused_seconds": 0,
+                "status": "running" if k == 0 and r % 2 else "ended",
+                "started_at": created, "created_at": created,
+            })
+    db.session.execute(db.insert(FocusSession), sessions)
+    db.session.commit()
+    db.session.execute(db.text("ANALYZE"))
+    db.session.commit()
+
+
+def capture(fn) -> List[Tuple[str, object]]:
+    statements: List[Tuple[str, object]] = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+        db.session.rollback()
+    return statements
+
+
+def explain(statement: str, parameters) -> List[str]:
+    conn = db.session.connection()
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        return [row[-1] for row in rows]
+
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lines: List[str] = []
+
+    def walk(node, depth=0):
+        label = node["Node Type"]
+        if "Relation Name" in node:
+            label += f" on {node['Relation Name']}"
+        if "Index Name" in node:
+            label += f" using {node['Index Name']}"
+        lines.append("  " * depth + label)
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    walk(plan[0]["Plan"])
+    return lines
+
+
+def problems(plan: List[str], table: str, index: str, sort_ok: bool) -> List[str]:
+    text = "\n".join(plan)
+    found = []
+    if index not in text:
+        found.append(f"does not use {index}")
+    for line in plan:
+        line = line.strip()
+        # SQLite: "SCAN room_members" / Postgres: "Seq Scan on room_members"
+        if line in (f"SCAN {table}",) or line.startswith(f"Seq Scan on {table}"):
+            found.append(f"full scan of {table}")
+        if sort_ok:
+            continue
+        if "TEMP B-TREE" in line or line.startswith("Sort") or line.startswith("Incremental Sort"):
+            found.append(f"separate sort step ({line})")
+    return found
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    add_scratch_argument(ap)
+    args = ap.parse_args()
+
+    app = make_app(i_know=args.i_know)
+    failed = False
+    with app.app_context():
+        seed()
+        for name, fn, table, index, sort_ok in CHECKS:
+            statements = [(s, p) for s, p in capture(fn) if table in s]
+            if not statements:
+                print(f"FAIL {name}: no statement on {table} captured")
+                failed = True
+                continue
+
+            statement, parameters = statements[-1]
+            plan = explain(statement, parameters)
+            db.session.rollback()
+            issues = problems(plan, table, index, sort_ok)
+            print(f"{'FAIL' if issues else 'ok  '} {name:<32} {index}" + (f"  ({'; '.join(issues)})" if issues else ""))
+            if issues or args.verbose:
+                print("      " + "\n      ".join(plan))
+            failed = failed or bool(issues)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Encode cost and size of the broadcasts we fan out most.
+
+    python -m bench.serialization
+
+For realistic room sizes, encodes a timer:update and a full
+presence:update snapshot as Socket.IO packets with the stdlib json
+module, orjson (main.json.OrjsonPacketJSON) and MessagePack, and prints
+microseconds per encode and bytes per broadcast (x room size = bytes
+fanned out per event).
+"""
+from __future__ import annotations
+
+import json
+import timeit
+
+from socketio import packet as sio_packet
+
+try:
+    from socketio import msgpack_packet
+except ImportError:
+    msgpack_packet = None
+
+from main.json import OrjsonPacketJSON, orjson
+
+ROOM_SIZES = (10, 100, 500, 5000)
+
+
+def payloads(n: int):
+    timer = ["timer:update", {
+        "room_id": 42, "status": "running", "remaining_seconds": 1337,
+        "duration_seconds": 1500, "started_by": 7,
+    }]
+    users = list(range(1000, 1000 + n))
+    presence = ["presence:update", {"room_id": 42, "count": n, "users": users}]
+    return timer, presence
+
+
+def encoders():
+    def with_json(module):
+        class P(sio_packet.Packet):
+            json = module
+        return lambda data: P(sio_packet.EVENT, data=data).encode()
+
+    out = {"json": with_json(json)}
+    if orjson is not None:
+        out["orjson"] = with_json(OrjsonPacketJSON)
+    if msgpack_packet is not None:
+        out["msgpack"] = lambda data: msgpack_packet.MsgPackPacket(sio_packet.EVENT, data=data).encode()
+    return out
+
+
+def main() -> None:
+    encs = encoders()
+    print(f"{'room':>6} {'event':<16} " + " ".join(f"{name + ' us':>11} {'bytes':>7}" for name in encs))
+    for n in ROOM_SIZES:
+        for data in payloads(n):
+            cells = []
+            for enc in encs.values():
+                number = 2000 if n <= 500 else 200
+                us = timeit.timeit(lambda: enc(data), number=number) / number * 1e6
+                cells.append(f"{us:>11.2f} {len(enc(data)):>7}")
+            print(f"{n:>6} {data[0]:<16} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
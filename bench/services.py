@@ -0,0 +1,260 @@
+"""
+Service-layer micro-benchmarks with saved baselines.
+
+    python -m bench.services                      # run, compare with baseline if any
+    python -m bench.services --save               # run and store as the baseline
+    python -m bench.services --threshold 0.15 --filter rooms
+
+Seeds an in-process database to realistic sizes (20k users, 2k rooms,
+one 5k-member room, 100k historical sessions; --scale shrinks or grows
+it), then times the hot service calls pytest-benchmark style: warmup,
+then repeated rounds, reporting min/median/mean/stddev per call.
+
+The baseline is a JSON file (.benchmarks/services.json by default,
+per machine). A benchmark whose median is more than --threshold slower
+than its baseline is flagged and the run exits non-zero.
+Set BENCH_DATABASE_URL to run against Postgres instead of SQLite; all
+of that database's tables are dropped first (see bench/_app.py).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from main.db import db
+from models.focus import FocusSession
+from rooms.models import Room, RoomMember
+
+from ._app import add_scratch_argument, make_app, seed_users
+
+DEFAULT_BASELINE = os.path.join(".benchmarks", "services.json")
+
+USERS = 20_000
+ROOMS = 2_000
+BIG_ROOM_MEMBERS = 5_000
+ROOMS_PER_USER = 24
+SESSIONS_PER_ROOM = 50
+
+
+def seed(scale: float) -> dict:
+    rnd = random.Random(7)
+    users = max(100, int(USERS * scale))
+    rooms = max(10, int(ROOMS * scale))
+    big = min(users, max(50, int(BIG_ROOM_MEMBERS * scale)))
+    now = datetime.utcnow()
+
+    seed_users(users)
+    db.session.execute(db.insert(Room), [
+        {"name": f"Room {r}", "owner_id": rnd.randint(1, users),
+         "created_at": now - timedelta(minutes=rooms - r)}
+        for r in range(1, rooms + 1)
+    ])
+
+    pairs = set()
+    for r in range(1, rooms + 1):
+        pairs.update((r, rnd.randint(1, users)) for _ in range(4))
+    # a heavy user (rooms index) and a big room (members page)
+    pairs.update((r, 1) for r in rnd.sample(range(1, rooms + 1), min(rooms, ROOMS_PER_USER * 2)))
+    pairs.update((1, u) for u in range(1, big + 1))
+    db.session.execute(db.insert(RoomMember), [
+        {"room_id": r, "user_id": u, "joined_at": now - timedelta(seconds=rnd.randint(0, 86400 * 90))}
+        for r, u in pairs
+    ])
+
+    sessions = []
+    for r in range(1, rooms + 1):
+        for k in range(int(SESSIONS_PER_ROOM * min(scale, 1.0)) or 1):
+            started = now - timedelta(hours=k + 1)
+            sessions.append({
+                "room_id": r, "started_by": 1, "status": "ended", "duration_seconds": 1500,
+                "started_at": started, "ended_at": started + timedelta(minutes=25),
+                "paused_seconds": 0, "created_at": started,
+            })
+        if r % 3 == 0:
+            sessions.append({
+                "room_id": r, "started_by": 1, "status": "running", "duration_seconds": 1500,
+                "started_at": now, "paused_seconds": 0, "created_at": now,
+            })
+    for i in range(0, len(sessions), 50_000):
+        db.session.execute(db.insert(FocusSession), sessions[i:i + 50_000])
+    db.session.commit()
+    return {"users": users, "rooms": rooms, "big_room_members": big, "sessions": len(sessions)}
+
+
+class Runner:
+    def __init__(self, min_time: float, max_rounds: int, name_filter: str | None):
+        self.min_time = min_time
+        self.max_rounds = max_rounds
+        self.name_filter = name_filter
+        self.results: Dict[str, dict] = {}
+
+    def bench(self, name: str, fn: Callable[[], object], setup: Callable[[], None] | None = None) -> None:
+        if self.name_filter and self.name_filter not in name:
+            return
+        for _ in range(3):  # warmup
+            if setup:
+                setup()
+            fn()
+
+        times: List[float] = []
+        spent = 0.0
+        while len(times) < 5 or (spent < self.min_time and len(times) < self.max_rounds):
+            if setup:
+                setup()
+            t0 = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - t0
+            times.append(elapsed)
+            spent += elapsed
+
+        self.results[name] = {
+            "rounds": len(times),
+            "min_us": round(min(times) * 1e6, 2),
+            "median_us": round(statistics.median(times) * 1e6, 2),
+            "mean_us": round(statistics.fmean(times) * 1e6, 2),
+            "stddev_us": round(statistics.pstdev(times) * 1e6, 2),
+        }
+
+
+def run_all(runner: Runner, sizes: dict) -> None:
+    from auth.service import find_user_by_login_identifier
+    from rooms.service import decode_cursor, get_room_members, get_user_rooms
+    from rooms.sessions_service import end_session, get_active_session, start_session
+    from rooms.state_cache import room_state_cache
+
+    rnd = random.Random(1)
+    rooms, users = sizes["rooms"], sizes["users"]
+
+    def done():
+        db.session.rollback()
+
+    def timed_read(name, fn):
+        # every call ends its transaction, like a request would
+        runner.bench(name, lambda: (fn(), done()))
+
+    timed_read("sessions.get_active_session[running]",
+               lambda: get_active_session(rnd.randrange(3, rooms + 1, 3)))
+    timed_read("sessions.get_active_session[idle]",
+               lambda: get_active_session(rnd.randrange(1, rooms + 1, 3)))
+
+    timed_read("rooms.get_user_rooms[first page]", lambda: get_user_rooms(1))
+    _, cursor = get_user_rooms(1)
+    before = decode_cursor(cursor) if cursor else None
+    timed_read("rooms.get_user_rooms[second page]", lambda: get_user_rooms(1, before=before))
+
+    big_room = db.session.get(Room, 1)
+    db.session.expunge(big_room)
+    timed_read("rooms.get_room_members[first page]", lambda: get_room_members(big_room))
+    deep = None
+    for _ in range(20):
+        _, c = get_room_members(big_room, after=deep)
+        if not c:
+            break
+        deep = decode_cursor(c)
+    timed_read("rooms.get_room_members[page 20]", lambda: get_room_members(big_room, after=deep))
+
+    cycle_room = 2  # no running session at seed time
+    owner = db.session.get(Room, cycle_room).owner_id
+
+    def cycle():
+        start_session(cycle_room, owner, 1500)
+        end_session(cycle_room, owner)
+        db.session.remove()
+
+    runner.bench("sessions.start_end_cycle", cycle, setup=lambda: room_state_cache.invalidate(cycle_room))
+
+    timed_read("auth.find_user_by_login_identifier[email]",
+               lambda: find_user_by_login_identifier(f"USER{rnd.randint(1, users)}@example.com"))
+    timed_read("auth.find_user_by_login_identifier[username]",
+               lambda: find_user_by_login_identifier(f"user{rnd.randint(1, users)}"))
+
+    running = FocusSession(room_id=1, started_by=1, status="running", duration_seconds=1500,
+                           started_at=datetime.utcnow(), paused_seconds=30)
+    paused = FocusSession(room_id=1, started_by=1, status="paused", duration_seconds=1500,
+                          started_at=datetime.utcnow(), paused_at=datetime.utcnow(), paused_seconds=30)
+    runner.bench("models.remaining_seconds[running]", running.remaining_seconds)
+    runner.bench("models.remaining_seconds[paused]", paused.remaining_seconds)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    regressions = []
+    print(f"{'benchmark':<48} {'median us':>10} {'baseline':>10} {'change':>8}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<48} {r['median_us']:>10.1f} {'-':>10} {'new':>8}")
+            continue
+        change = r["median_us"] / base["median_us"] - 1
+        mark = ""
+        if change > threshold:
+            mark = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<48} {r['median_us']:>10.1f} {base['median_us']:>10.1f} {change:>+8.1%}{mark}")
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", type=float, default=1.0, help="multiplier for the seeded data sizes")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save", action="store_true", help="store this run as the new baseline")
+    ap.add_argument("--threshold", type=float, default=0.20, help="allowed median slowdown (0.20 = 20%%)")
+    ap.add_argument("--min-time", type=float, default=0.5, help="seconds spent per benchmark")
+    ap.add_argument("--max-rounds", type=int, default=5000)
+    ap.add_argument("--filter", help="only run benchmarks whose name contains this")
+    add_scratch_argument(ap)
+    args = ap.parse_args()
+
+    app = make_app(i_know=args.i_know)
+    with app.app_context():
+        t0 = time.perf_counter()
+        sizes = seed(args.scale)
+        print(f"seeded {sizes} in {time.perf_counter() - t0:.1f}s")
+
+        runner = Runner(args.min_time, args.max_rounds, args.filter)
+        run_all(runner, sizes)
+        dialect = db.engine.dialect.name
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored.get("meta", {}).get("database") != dialect or stored.get("meta", {}).get("sizes") != sizes:
+            print(f"note: baseline {args.baseline} was taken with a different database or data size")
+        baseline = stored.get("benchmarks", {})
+
+    regressions = compare(runner.results, baseline, args.threshold)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "meta": {
+                    "at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "database": dialect,
+                    "sizes": sizes,
+                },
+                "benchmarks": runner.results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) more than {args.threshold:.0%} slower than baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""
+Socket.IO load test: M connections in N rooms, owners driving timers.
+
+    python -m bench.socket_load [--connections 200] [--rooms 20] [--cycles 5]
+                                [--workers 1] [--out results.json]
+
+Seeds M synthetic users and N rooms straight into a scratch database
+(SQLite by default, BENCH_DATABASE_URL for Postgres; its tables are
+dropped first, see bench/_app.py), starts the app
+under gunicorn exactly as in production, then from this process:
+
+  1. logs every user in over HTTP (POST /login),
+  2. opens one websocket connection per user and emits room:join,
+  3. has each room owner run start/pause/resume/reset `--cycles` times,
+     `--interval` seconds apart, all rooms at once.
+
+Fan-out latency is the time from an owner's emit to each member's
+receipt of the resulting timer:update (client and timing clock are the
+same process, so no clock skew). Server CPU and RSS are sampled from
+the gunicorn master and its workers. Results are printed as one JSON
+object (and written to --out) so runs can be diffed between commits.
+
+More than one --workers needs SOCKETIO_MESSAGE_QUEUE and
+PRESENCE_BACKEND=redis in the environment, as in production. Needs the
+packages in bench/requirements.txt; the server's log goes to a temp
+file whose path is printed at start.
+"""
+from __future__ import annotations
+
+from gevent import monkey
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import platform  # noqa: E402
+import socket  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from datetime import datetime  # noqa: E402
+
+import gevent  # noqa: E402
+import psutil  # noqa: E402
+import requests  # noqa: E402
+import socketio  # noqa: E402
+from gevent.event import Event  # noqa: E402
+from gevent.pool import Pool  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from main.db import db  # noqa: E402
+from main.migrations import upgrade  # noqa: E402
+from models.user import User  # noqa: E402
+from rooms.models import Room, RoomMember  # noqa: E402
+
+from ._app import add_scratch_argument, make_app, seed_users  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "loadtest123"
+# cheap on purpose: the test is about sockets, not password hashing
+HASH_METHOD = "pbkdf2:sha256:1000"
+SEQUENCE = ("timer:start", "timer:pause", "timer:resume", "timer:reset")
+
+
+def percentiles(values) -> dict:
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+
+    def at(p):
+        return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+    return {
+        "count": len(values),
+        "p50_ms": at(.50),
+        "p95_ms": at(.95),
+        "p99_ms": at(.99),
+        "max_ms": round(values[-1] * 1000, 2),
+    }
+
+
+def seed(database_url: str | None, users: int, rooms: int, i_know: bool = False) -> tuple[str, dict[int, list[int]]]:
+    """Returns the database URL and room_id -> [user ids], owner first."""
+    app = make_app(database_url, i_know=i_know)
+    with app.app_context():
+        password_hash = generate_password_hash(PASSWORD, method=HASH_METHOD)
+        seed_users(users, start=0, prefix="load", password_hash=password_hash)
+        user_ids = db.session.execute(db.select(User.id).order_by(User.id)).scalars().all()
+
+        members: dict[int, list[int]] = defaultdict(list)
+        for i, uid in enumerate(user_ids):
+            members[i % rooms].append(uid)
+
+        room_ids = {}
+        for i in range(rooms):
+            room = Room(name=f"Load room {i}", owner_id=members[i][0])
+            db.session.add(room)
+            db.session.flush()
+            room_ids[i] = room.id
+        db.session.execute(db.insert(RoomMember), [
+            {"room_id": room_ids[i], "user_id": uid}
+            for i, uids in members.items() for uid in uids
+        ])
+        db.session.commit()
+        upgrade()  # stamps the schema version the server checks for
+        url = db.engine.url.render_as_string(hide_password=False)
+    return url, {room_ids[i]: uids for i, uids in members.items()}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(database_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        SECRET_KEY=os.getenv("SECRET_KEY", "load-test"),
+        PASSWORD_HASH_METHOD=HASH_METHOD,
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_WORKER_CONNECTIONS=os.getenv("GUNICORN_WORKER_CONNECTIONS", "10000"),
+    )
+    # a file, not a pipe: nobody reads the server's log while the test
+    # runs, and a full pipe buffer would stall it
+    log = tempfile.NamedTemporaryFile(prefix="focusbuddy-load-", suffix=".log", delete=False)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=log,
+    )
+    log.close()
+    print(f"server log: {log.name}", file=sys.stderr)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            with open(log.name, errors="replace") as f:
+                raise RuntimeError("server exited:\n" + f.read()[-4000:])
+        try:
+            requests.get(f"http://127.0.0.1:{port}/login", timeout=1)
+            return proc
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not come up in 30s")
+
+
+class ResourceSampler:
+    """CPU% (summed over master + workers) and RSS of the server."""
+
+    def __init__(self, pid: int, every: float = 0.5):
+        self.root = psutil.Process(pid)
+        self.every = every
+        self.cpu: list[float] = []
+        self.rss: list[int] = []
+        self._procs: dict[int, psutil.Process] = {}
+        self._greenlet = None
+
+    def _tree(self):
+        procs = [self.root] + self.root.children(recursive=True)
+        for p in procs:
+            if p.pid not in self._procs:
+                p.cpu_percent(None)  # first call only primes the counter
+                self._procs[p.pid] = p
+        return [self._procs[p.pid] for p in procs]
+
+    def _run(self):
+        self._tree()
+        while True:
+            gevent.sleep(self.every)
+            try:
+                procs = self._tree()
+                self.cpu.append(sum(p.cpu_percent(None) for p in procs))
+                self.rss.append(sum(p.memory_info().rss for p in procs))
+            except psutil.NoSuchProcess:
+                return
+
+    def start(self):
+        self._greenlet = gevent.spawn(self._run)
+
+    def stop(self) -> dict:
+        self._greenlet.kill()
+        if not self.cpu:
+            return {}
+        return {
+            "cpu_avg_pct": round(sum(self.cpu) / len(self.cpu), 1),
+            "cpu_max_pct": round(max(self.cpu), 1),
+            "rss_max_mb": round(max(self.rss) / 2 ** 20, 1),
+            "rss_end_mb": round(self.rss[-1] / 2 ** 20, 1),
+        }
+
+
+class LoadClient:
+    def __init__(self, base_url: str, user_id: int, room_id: int, bench: "Bench"):
+        self.base_url = base_url
+        self.user_id = user_id
+        self.room_id = room_id
+        self.bench = bench
+        self.cookie = ""
+        self.sio = socketio.Client(reconnection=False)
+        self.joined = Event()
+        self._seen_seq = -1
+        self.sio.on("timer:update", self._on_timer_update)
+
+    def login(self) -> None:
+        http = requests.Session()
+        r = http.post(
+            f"{self.base_url}/login",
+            data={"identifier": f"load{self.user_id - self.bench.first_user_id}", "password": PASSWORD},
+            allow_redirects=False,
+        )
+        if "session" not in http.cookies:
+            raise RuntimeError(f"login failed for user {self.user_id}: HTTP {r.status_code}")
+        self.cookie = f"session={http.cookies['session']}"
+
+    def connect(self) -> None:
+        self.sio.connect(
+            self.base_url,
+            headers={"Cookie": self.cookie},
+            transports=["websocket"],
+            wait_timeout=30,
+        )
+
+    def join(self) -> None:
+        self.sio.emit("room:join", {"room_id": self.room_id})
+
+    def _on_timer_update(self, data) -> None:
+        received = time.perf_counter()
+        if not self.joined.is_set():
+            self.joined.set()  # the snapshot sent on room:join
+            return
+        seq, sent = self.bench.last_action.get(self.room_id, (None, None))
+        if seq is None or seq == self._seen_seq:
+            return
+        self._seen_seq = seq
+        self.bench.fanout.append(received - sent)
+
+
+class Bench:
+    def __init__(self, base_url: str, rooms: dict[int, list[int]], concurrency: int):
+        self.base_url = base_url
+        self.rooms = rooms
+        self.pool_size = concurrency
+        self.first_user_id = min(uid for uids in rooms.values() for uid in uids)
+        self.clients = [
+            LoadClient(base_url, uid, room_id, self)
+            for room_id, uids in rooms.items() for uid in uids
+        ]
+        self.owners = {c.room_id: c for c in self.clients if c.user_id == rooms[c.room_id][0]}
+        self.last_action: dict[int, tuple[int, float]] = {}
+        self.fanout: list[float] = []
+        self.errors = 0
+
+    def _phase(self, fn, items) -> tuple[list[float], float]:
+        timings: list[float] = []
+
+        def timed(item):
+            t0 = time.perf_counter()
+            try:
+                fn(item)
+                timings.append(time.perf_counter() - t0)
+            except Exception as exc:
+                self.errors += 1
+                if self.errors <= 5:
+                    print(f"error: {exc!r}", file=sys.stderr)
+
+        started = time.perf_counter()
+        Pool(self.pool_size).map(timed, items)
+        return timings, time.perf_counter() - started
+
+    def login(self) -> dict:
+        timings, elapsed = self._phase(LoadClient.login, self.clients)
+        return {**percentiles(timings), "per_s": round(len(timings) / elapsed, 1)}
+
+    def connect(self) -> dict:
+        timings, elapsed = self._phase(LoadClient.connect, self.clients)
+        return {**percentiles(timings), "per_s": round(len(timings) / elapsed, 1), "seconds": round(elapsed, 2)}
+
+    def join(self) -> dict:
+        def join_and_wait(c):
+            c.join()
+            if not c.joined.wait(30):
+                raise RuntimeError(f"no timer:update after room:join (user {c.user_id})")
+
+        timings, elapsed = self._phase(join_and_wait, self.clients)
+        return {**percentiles(timings), "per_s": round(len(timings) / elapsed, 1)}
+
+    def timers(self, cycles: int, interval: float) -> dict:
+        seq = 0
+        actions = 0
+        expected = 0
+        for _ in range(cycles):
+            for event in SEQUENCE:
+                seq += 1
+                for room_id, owner in self.owners.items():
+                    self.last_action[room_id] = (seq, time.perf_counter())
+                    payload = {"room_id": room_id}
+                    if event == "timer:start":
+                        payload["minutes"] = 25
+                    owner.sio.emit(event, payload)
+                    actions += 1
+                    expected += len(self.rooms[room_id])
+                gevent.sleep(interval)
+        received = len(self.fanout)
+        return {
+            "actions": actions,
+            "expected_deliveries": expected,
+            "delivered_ratio": round(received / expected, 4) if expected else None,
+            **percentiles(self.fanout),
+        }
+
+    def close(self) -> None:
+        Pool(self.pool_size).map(lambda c: c.sio.connected and c.sio.disconnect(), self.clients)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--connections", type=int, default=200, help="users = connections (M)")
+    ap.add_argument("--rooms", type=int, default=20, help="rooms (N), owner is the room's first user")
+    ap.add_argument("--cycles", type=int, default=5, help="start/pause/resume/reset rounds per room")
+    ap.add_argument("--interval", type=float, default=0.5, help="seconds between timer actions")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--concurrency", type=int, default=50, help="parallel logins/connects")
+    ap.add_argument("--out", help="also write the JSON result here")
+    add_scratch_argument(ap)
+    args = ap.parse_args()
+    if args.rooms > args.connections:
+        ap.error("--rooms must not exceed --connections")
+
+    database_url, rooms = seed(os.getenv("BENCH_DATABASE_URL"), args.connections, args.rooms, args.i_know)
+    port = free_port()
+    server = start_server(database_url, port, args.workers)
+    base_url = f"http://127.0.0.1:{port}"
+
+    sampler = ResourceSampler(server.pid)
+    bench = Bench(base_url, rooms, args.concurrency)
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "database": database_url.split(":", 1)[0],
+            "args": vars(args),
+        },
+    }
+    try:
+        result["login"] = bench.login()
+        sampler.start()
+        result["connect"] = bench.connect()
+        result["join"] = bench.join()
+        result["fanout"] = bench.timers(args.cycles, args.interval)
+        result["server"] = sampler.stop()
+        result["client_cpu_s"] = round(sum(psutil.Process().cpu_times()[:2]), 2)
+        result["errors"] = bench.errors
+    finally:
+        bench.close()
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    out = json.dumps(result, indent=2)
+    print(out)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+    return 1 if bench.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
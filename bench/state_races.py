@@ -0,0 +1,141 @@
+"""
+Race checks for the room state cache.
+
+    python -m bench.state_races
+
+Forces each interleaving below at the exact point where it used to go
+wrong, and exits non-zero if the cache or a long-poll ends up on stale
+state:
+
+  * long-poll: a change published after the endpoint read the state but
+    before it started waiting must still wake it at once, while refilling
+    a cold cache (no change) must not.
+  * cache fill: a control committed while a cache miss is reading the
+    room's latest session must not be overwritten by that older read.
+"""
+from __future__ import annotations
+
+import sys
+
+from ._app import use_app_env
+
+use_app_env("races")
+
+import app as app_module  # noqa: E402  (patches gevent, must come after env)
+
+import time  # noqa: E402
+from datetime import datetime  # noqa: E402
+
+from main.db import db  # noqa: E402
+from main.migrations import upgrade  # noqa: E402
+from rooms import sessions_service  # noqa: E402
+from rooms.state_cache import SessionSnapshot, room_state_cache  # noqa: E402
+
+WAIT = 3.0
+
+
+def _paused(snap: SessionSnapshot) -> SessionSnapshot:
+    return SessionSnapshot(
+        id=snap.id, room_id=snap.room_id, started_by=snap.started_by, status="paused",
+        duration_seconds=snap.duration_seconds, started_at=snap.started_at,
+        paused_at=datetime.utcnow(), paused_seconds=snap.paused_seconds,
+    )
+
+
+def setup(app):
+    owner = app.test_client()
+    owner.post("/register", data={
+        "username": "racer", "email": "racer@example.com",
+        "password": "secret123", "confirm": "secret123",
+    })
+    r = owner.post("/rooms/create", data={"name": "Race room"})
+    room_id = int(r.headers["Location"].rstrip("/").split("/")[-1])
+    owner.post(f"/rooms/{room_id}/session/start", data={"minutes": "25"})
+    return owner, room_id
+
+
+def long_poll_check(app, owner, room_id: int) -> list:
+    etag = owner.get(f"/rooms/{room_id}/session").headers["ETag"]
+
+    # the endpoint closes the session between its read and its wait
+    session = db.session
+    close = session.close
+
+    def close_then_publish():
+        close()
+        room_state_cache.publish(room_id, _paused(room_state_cache.get(room_id)))
+
+    session.close = close_then_publish
+    try:
+        started = time.perf_counter()
+        r = owner.get(f"/rooms/{room_id}/session?wait={WAIT}", headers={"If-None-Match": etag})
+        elapsed = time.perf_counter() - started
+    finally:
+        del session.close
+
+    print(f"  long-poll: {r.status_code} after {elapsed * 1000:.0f} ms")
+    problems = []
+    if r.status_code != 200 or r.headers.get("ETag") == etag:
+        problems.append(f"long-poll answered {r.status_code} with the ETag it was sent")
+    if elapsed >= WAIT:
+        problems.append(f"long-poll slept {elapsed:.1f}s through a change")
+
+    # the published snapshot above never reached the DB
+    room_state_cache.clear()
+    etag = owner.get(f"/rooms/{room_id}/session").headers["ETag"]
+    room_state_cache.clear()
+    started = time.perf_counter()
+    r = owner.get(f"/rooms/{room_id}/session?wait=0.5", headers={"If-None-Match": etag})
+    elapsed = time.perf_counter() - started
+    print(f"  long-poll, cold cache: {r.status_code} after {elapsed * 1000:.0f} ms")
+    if r.status_code != 304 or elapsed < 0.5:
+        problems.append(f"refilling the cache woke a long-poll ({r.status_code} after {elapsed:.2f}s)")
+    return problems
+
+
+def fill_check(app, room_id: int) -> list:
+    with app.app_context():
+        room_state_cache.clear()
+        read = sessions_service.get_latest_session
+        published = []
+
+        def read_then_publish(rid):
+            s = read(rid)
+            # another greenlet's pause commits while the miss is querying
+            published.append(_paused(SessionSnapshot.from_session(s)))
+            room_state_cache.publish(rid, published[0])
+            return s
+
+        sessions_service.get_latest_session = read_then_publish
+        try:
+            sessions_service.get_room_state(room_id)
+        finally:
+            sessions_service.get_latest_session = read
+        cached = room_state_cache.get(room_id)
+        room_state_cache.clear()
+        db.session.remove()
+
+    print(f"  cache fill: cached status {getattr(cached, 'status', cached)}")
+    if cached is not published[0]:
+        return ["a cache miss overwrote a newer published snapshot"]
+    return []
+
+
+def main() -> int:
+    app = app_module.app
+    app.config["SESSION_LONG_POLL_MAX"] = WAIT
+    with app.app_context():
+        upgrade()
+
+    owner, room_id = setup(app)
+    problems = long_poll_check(app, owner, room_id)
+    problems += fill_check(app, room_id)
+
+    for p in problems:
+        print("FAIL", p)
+    print("ok" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Stats read cost vs. focus_logs volume.
+
+    python -m bench.stats_reads [--sizes 10000,100000,1000000]
+
+Seeds N logs spread over 200 rooms / 2,000 users / 90 days, rebuilds the
+rollups and times a user's 30-day history and a room's 7-day leaderboard,
+next to the same answers computed straight from focus_logs.
+Set BENCH_DATABASE_URL to run against Postgres instead of SQLite; all
+of that database's tables are dropped first (see bench/_app.py).
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from main.db import db
+from models.focus import FocusLog
+from stats.service import backfill_rollups, get_user_history, get_room_leaderboard
+
+from ._app import add_scratch_argument, make_app
+
+ROOMS = 200
+USERS = 2000
+DAYS = 90
+REPEAT = 50
+
+
+def seed(n: int) -> None:
+    rnd = random.Random(42)
+    now = datetime.utcnow()
+    batch = []
+    for i in range(n):
+        batch.append({
+            "user_id": rnd.randint(1, USERS),
+            "room_id": rnd.randint(1, ROOMS),
+            "session_id": i + 1,
+            "focused_seconds": rnd.randint(60, 3600),
+            "created_at": now - timedelta(seconds=rnd.randint(0, DAYS * 86400)),
+        })
+        if len(batch) == 10_000:
+            db.session.execute(db.insert(FocusLog), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(FocusLog), batch)
+    db.session.commit()
+
+
+def raw_history(user_id: int, days: int):
+    since = datetime.utcnow() - timedelta(days=days)
+    return (
+        db.session.query(db.func.date(FocusLog.created_at), db.func.sum(FocusLog.focused_seconds), db.func.count())
+        .filter(FocusLog.user_id == user_id, FocusLog.created_at >= since)
+        .group_by(db.func.date(FocusLog.created_at))
+        .all()
+    )
+
+
+def raw_leaderboard(room_id: int, days: int):
+    since = datetime.utcnow() - timedelta(days=days)
+    total = db.func.sum(FocusLog.focused_seconds)
+    return (
+        db.session.query(FocusLog.user_id, total)
+        .filter(FocusLog.room_id == room_id, FocusLog.created_at >= since)
+        .group_by(FocusLog.user_id)
+        .order_by(total.desc())
+        .limit(10)
+        .all()
+    )
+
+
+def timed(fn, *args) -> float:
+    t0 = time.perf_counter()
+    for i in range(REPEAT):
+        fn(*args)
+    return (time.perf_counter() - t0) / REPEAT * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    add_scratch_argument(ap)
+    args = ap.parse_args()
+
+    print(f"{'logs':>10} {'history ms':>11} {'raw ms':>9} {'leaderboard ms':>15} {'raw ms':>9}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        app = make_app(i_know=args.i_know)
+        with app.app_context():
+            seed(n)
+            backfill_rollups()
+            print(
+                f"{n:>10} "
+                f"{timed(get_user_history, 7, 30):>11.3f} {timed(raw_history, 7, 30):>9.3f} "
+                f"{timed(get_room_leaderboard, 7, 7):>15.3f} {timed(raw_leaderboard, 7, 7):>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Concurrency check for the timer controls.
+
+    python -m bench.timer_race [--controls 400] [--rounds 3]
+
+Fires hundreds of simultaneous timer:start/pause/resume/reset/end events
+at one room (one greenlet and socket per control) and then checks that:
+
+  * the room never ends up with more than one running/paused session,
+  * no session was ended twice (one focus log per user and session),
+  * every accepted control broadcast exactly one timer:update,
+  * the cached room state matches the committed row.
+
+Exits non-zero on any violation. The row locks only come into play on
+Postgres (BENCH_DATABASE_URL), where the greenlets really interleave
+inside their transactions; on SQLite it is still a useful smoke test.
+"""
+from __future__ import annotations
+
+import sys
+
+from ._app import use_app_env
+
+use_app_env("race")
+
+import app as app_module  # noqa: E402  (patches gevent, must come after env)
+
+import argparse  # noqa: E402
+import random  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+from gevent.event import Event  # noqa: E402
+
+from main.db import db  # noqa: E402
+from main.migrations import upgrade  # noqa: E402
+from main.socketio_ext import socketio  # noqa: E402
+from models.focus import ACTIVE_STATUSES, FocusLog, FocusSession  # noqa: E402
+from rooms.sessions_service import get_latest_session  # noqa: E402
+from rooms.state_cache import SessionSnapshot, room_state_cache, state_version  # noqa: E402
+
+CONTROLS = ("timer:start", "timer:pause", "timer:resume", "timer:reset", "timer:end")
+
+
+def _updates(client) -> int:
+    return sum(1 for m in client.get_received() if m["name"] == "timer:update")
+
+
+def setup(app, name: str):
+    owner = app.test_client()
+    owner.post("/register", data={
+        "username": name, "email": f"{name}@example.com",
+        "password": "secret123", "confirm": "secret123",
+    })
+    r = owner.post("/rooms/create", data={"name": "Race room"})
+    room_id = int(r.headers["Location"].rstrip("/").split("/")[-1])
+    return owner, room_id
+
+
+def run_round(app, owner, room_id: int, controls: int, rnd: random.Random) -> list:
+    watcher = socketio.test_client(app, flask_test_client=owner)
+    watcher.emit("room:join", {"room_id": room_id})
+    watcher.get_received()
+
+    clients = [socketio.test_client(app, flask_test_client=owner) for _ in range(controls)]
+    events = [rnd.choice(CONTROLS) for _ in range(controls)]
+    go = Event()
+    failures = []
+
+    def fire(client, event):
+        go.wait()
+        try:
+            client.emit(event, {"room_id": room_id, "minutes": rnd.randint(1, 60)})
+            errors = [m for m in client.get_received() if m["name"] == "error"]
+            if errors:
+                failures.append(f"{event}: {errors[0]['args']}")
+        except Exception as exc:  # noqa: BLE001
+            failures.append(f"{event}: {exc!r}")
+
+    greenlets = [gevent.spawn(fire, c, e) for c, e in zip(clients, events)]
+    gevent.sleep(0)
+    started = time.perf_counter()
+    go.set()
+    gevent.joinall(greenlets)
+    elapsed = time.perf_counter() - started
+
+    problems = list(failures)
+    received = _updates(watcher)
+    if received != controls:
+        problems.append(f"{controls} controls broadcast {received} timer:update")
+
+    with app.app_context():
+        active = db.session.execute(
+            db.select(db.func.count()).where(
+                FocusSession.room_id == room_id, FocusSession.status.in_(ACTIVE_STATUSES)
+            )
+        ).scalar()
+        if active > 1:
+            problems.append(f"{active} active sessions in the room")
+
+        doubled = db.session.execute(
+            db.select(FocusLog.session_id, FocusLog.user_id)
+            .where(FocusLog.room_id == room_id)
+            .group_by(FocusLog.session_id, FocusLog.user_id)
+            .having(db.func.count() > 1)
+        ).all()
+        if doubled:
+            problems.append(f"{len(doubled)} sessions ended more than once")
+
+        latest = get_latest_session(room_id)
+        committed = SessionSnapshot.from_session(latest) if latest else None
+        if state_version(room_state_cache.get(room_id)) != state_version(committed):
+            problems.append("cached room state differs from the committed row")
+        db.session.remove()
+
+    for c in clients + [watcher]:
+        c.disconnect()
+
+    print(f"  {controls} controls in {elapsed * 1000:.0f} ms, "
+          f"{received} timer:update, {len(problems)} problem(s)")
+    return problems
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--controls", type=int, default=400, help="simultaneous controls per round")
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    app = app_module.app
+    with app.app_context():
+        upgrade()
+        dialect = db.engine.dialect.name
+
+    rnd = random.Random(args.seed)
+    owner, room_id = setup(app, f"racer{rnd.randint(1000, 9999)}")
+    print(f"database: {dialect}, room {room_id}")
+
+    problems = []
+    for _ in range(args.rounds):
+        problems += run_round(app, owner, room_id, args.controls, rnd)
+
+    for p in problems[:20]:
+        print("FAIL", p)
+    print("ok" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,101 @@ class Config:
     # (enable in production only)
     SESSION_COOKIE_SECURE = os.getenv("COOKIE_SECURE", "0") == "1"
 
+    # Password hashing: Werkzeug method string (changing it rehashes on
+    # next login) and native threads used to keep hashing off the gevent hub
+    # (0 = hash inline).
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_POOL_SIZE = int(os.getenv("PASSWORD_HASH_POOL_SIZE", "4"))
+
     # DB
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "")
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool (Postgres only). Under gevent every greenlet that
+    # touches the DB queues here, so size it for the worker's concurrency.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Behind pgbouncer (transaction pooling): no app-side pool, no prepared statements
+    DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+
+    # Startup only compares the schema version with the code's; migrations
+    # run via `flask db upgrade`. Strict: refuse to start when behind.
+    SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "1") == "1"
+    SCHEMA_CHECK_STRICT = os.getenv("SCHEMA_CHECK_STRICT", "0") == "1"
+
+    # Room timer state cache (per worker). With several workers changes are
+    # published on ROOM_STATE_BUS_URL (defaults to a redis:// Socket.IO
+    # message queue) so the others drop their copy; the TTL (0 = never
+    # expire, default 5 s with WEB_CONCURRENCY > 1) covers lost messages.
+    ROOM_STATE_CACHE_SIZE = int(os.getenv("ROOM_STATE_CACHE_SIZE", "4096"))
+    ROOM_STATE_CACHE_TTL = float(os.getenv(
+        "ROOM_STATE_CACHE_TTL", "5" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "0"
+    ))
+    ROOM_STATE_BUS_URL = os.getenv("ROOM_STATE_BUS_URL", "")
+
+    # Upper bound for GET /rooms/<id>/session?wait=<seconds>
+    SESSION_LONG_POLL_MAX = float(os.getenv("SESSION_LONG_POLL_MAX", "30"))
+
+    # (room_id, user_id) -> membership/ownership cache (per worker)
+    MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "16384"))
+    MEMBERSHIP_CACHE_TTL = float(os.getenv("MEMBERSHIP_CACHE_TTL", "30"))
+
+    # Presence: "memory" (single worker) or "redis" (shared between workers)
+    PRESENCE_BACKEND = os.getenv("PRESENCE_BACKEND", "memory")
+    PRESENCE_REDIS_URL = os.getenv("PRESENCE_REDIS_URL", "redis://localhost:6379/0")
+    PRESENCE_TTL = float(os.getenv("PRESENCE_TTL", "30"))
+    PRESENCE_HEARTBEAT = float(os.getenv("PRESENCE_HEARTBEAT", "10"))
+
+    # Presence join/leave bursts within this window go out as one delta
+    PRESENCE_COALESCE_MS = int(os.getenv("PRESENCE_COALESCE_MS", "250"))
+
+    # Server-side timer: end running sessions at their deadline
+    TIMER_SCHEDULER_ENABLED = os.getenv("TIMER_SCHEDULER_ENABLED", "1") == "1"
+
+    # Per-request / per-event DB stats (queries, commits, DB time).
+    # X-DB-Stats response header, and raising instead of warning when a
+    # route or event goes over its round-trip budget (for CI).
+    DB_STATS_HEADER = os.getenv("DB_STATS_HEADER", "0") == "1"
+    QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"
+
+    # Serialization: "orjson" (if installed) or "json" for Flask responses
+    # and Socket.IO packets; SOCKETIO_SERIALIZER=msgpack switches every
+    # Socket.IO client to binary MessagePack packets.
+    JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "orjson")
+    SOCKETIO_SERIALIZER = os.getenv("SOCKETIO_SERIALIZER", "json")
+
+    # Message queue (e.g. redis://...) so emits reach sockets on every
+    # worker; required with more than one gunicorn worker.
+    SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+
+    # Prometheus /metrics (needs prometheus_client). Gauges are sampled
+    # every METRICS_REFRESH seconds per worker.
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+    METRICS_REFRESH = float(os.getenv("METRICS_REFRESH", "5"))
+
+    # Opt-in tracing: per request/event trace ids and SQL/render/emit/hash
+    # spans; traces slower than TRACE_SLOW_MS go to TRACE_FILE as JSON lines
+    # (or to the focusbuddy.trace logger when unset).
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+    TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "250"))
+    TRACE_FILE = os.getenv("TRACE_FILE", "")
+    TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))
+
+    # Stack-sampling profiler, toggled per worker with `kill -USR2 <pid>`
+    PROFILER_SIGNAL = os.getenv("PROFILER_SIGNAL", "1") == "1"
+    PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+    PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+    # Retention (`flask stats archive`, run from cron): finished sessions
+    # older than RETENTION_DAYS move with their focus_logs to the archive
+    # tables, RETENTION_BATCH_SIZE per short transaction. The job refuses to
+    # run inside RETENTION_PEAK_HOURS ("8-23", UTC; empty = anytime).
+    RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "90"))
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+    RETENTION_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", "0.5"))
+    RETENTION_PEAK_HOURS = os.getenv("RETENTION_PEAK_HOURS", "")
+    RETENTION_LOCK_TIMEOUT_MS = int(os.getenv("RETENTION_LOCK_TIMEOUT_MS", "2000"))
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Production server: gevent-websocket workers, app built once in the master
+(preload) and forked. Per-worker state (DB connections, background
+greenlets, the password-hash thread pool) is created after the fork.
+
+    flask --app app db upgrade           # separate step, before rollout
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+More than one worker needs SOCKETIO_MESSAGE_QUEUE and PRESENCE_BACKEND=redis,
+plus sticky sessions at the load balancer for Socket.IO polling, and
+PROMETHEUS_MULTIPROC_DIR so /metrics aggregates over all workers. The
+per-worker room state cache needs a Redis for invalidations: a redis://
+SOCKETIO_MESSAGE_QUEUE is reused, otherwise set ROOM_STATE_BUS_URL (and
+keep ROOM_STATE_CACHE_TTL non-zero either way).
+"""
+import glob
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "geventwebsocket.gunicorn.workers.GeventWebSocketWorker"
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+# long-polls and websockets are long-lived; the gevent worker heartbeats anyway
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+# Prepared here, not in on_starting: preload imports the app (and creates
+# the metric files) first. Stale samples from a previous run would be summed in.
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    for _f in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(_f)
+
+
+def post_fork(server, worker):
+    # connections opened in the master (schema check) must not be shared
+    from app import app
+    from main.db import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    from app import app, start_background_tasks
+
+    start_background_tasks(app)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,3 +1,112 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Dict
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+logger = logging.getLogger("focusbuddy.db")
 
 db = SQLAlchemy()
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def as_dict(self, pool=None) -> Dict[str, Any]:
+        data = {
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "wait_seconds_total": round(self.wait_time, 6),
+            "wait_seconds_max": round(self.max_wait, 6),
+            "timeouts": self.timeouts,
+        }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "idle": pool.checkedin(),
+            })
+        return data
+
+
+pool_stats = PoolStats()
+
+# checkouts slower than this are counted as a wait (and logged when long,
+# at most once per _WARN_EVERY seconds so an exhausted pool can't flood logs)
+_WAIT_THRESHOLD = 0.001
+_SLOW_WAIT = 0.1
+_WARN_EVERY = 10.0
+_last_warn = 0.0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long greenlets queue for a connection.
+    Under gevent that wait is invisible otherwise: it just looks like a
+    slow request.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            pool_stats.checkouts += 1
+            if waited > _WAIT_THRESHOLD:
+                pool_stats.waits += 1
+                pool_stats.wait_time += waited
+                pool_stats.max_wait = max(pool_stats.max_wait, waited)
+                if waited > _SLOW_WAIT:
+                    _warn_slow_wait(waited)
+
+
+def _warn_slow_wait(waited: float) -> None:
+    global _last_warn
+    now = time.monotonic()
+    if now - _last_warn >= _WARN_EVERY:
+        _last_warn = now
+        logger.warning(
+            "waited %.0f ms for a DB connection (pool exhausted); %d slow waits so far",
+            waited * 1000, pool_stats.waits,
+        )
+
+
+def engine_options(config) -> Dict[str, Any]:
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_POOL_* settings."""
+    uri = config.get("SQLALCHEMY_DATABASE_URI") or ""
+    if not uri.startswith("postgresql"):
+        # SQLite & co: let Flask-SQLAlchemy pick its defaults
+        return {}
+
+    if config.get("DB_PGBOUNCER"):
+        # pgbouncer in transaction mode does the pooling, and a server
+        # connection is not ours between transactions, so no prepared
+        # statements either.
+        return {
+            "poolclass": NullPool,
+            "pool_pre_ping": False,
+            "connect_args": {"prepare_threshold": None},
+        }
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config.get("DB_POOL_SIZE", 10),
+        "max_overflow": config.get("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": config.get("DB_POOL_TIMEOUT", 10),
+        "pool_pre_ping": config.get("DB_POOL_PRE_PING", True),
+        "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+    }
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import logging
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("focusbuddy.db")
+
+# Max DB round-trips (statements + commits) per HTTP endpoint / socket event.
+# Keep these tight: bench/query_budgets.py fails when a hot path regresses.
+QUERY_BUDGETS: Dict[str, int] = {
+    "rooms.rooms_index": 1,
+    "rooms.room_detail": 3,
+    "rooms.room_members": 2,
+    "rooms.room_session_status": 1,
+    "rooms.room_presence": 1,
+    "rooms.room_session_start": 4,
+    "stats.stats_history": 1,
+    "stats.stats_room_leaderboard": 1,
+    "socket:room:join": 1,
+    "socket:room:leave": 0,
+    "socket:disconnect": 0,
+    "socket:timer:start": 8,
+    "socket:timer:pause": 4,
+    "socket:timer:resume": 4,
+    "socket:timer:reset": 4,
+    "socket:timer:end": 7,
+}
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class DBStats:
+    __slots__ = ("queries", "commits", "db_time", "started")
+
+    def __init__(self):
+        self.queries = 0
+        self.commits = 0
+        self.db_time = 0.0
+        self.started = time.perf_counter()
+
+    @property
+    def round_trips(self) -> int:
+        return self.queries + self.commits
+
+    def header_value(self) -> str:
+        return f"queries={self.queries};commits={self.commits};db_ms={self.db_time * 1000:.2f}"
+
+
+# fn(name) per started and fn(name, seconds, stats) per finished
+# request/event, e.g. main.metrics and main.tracing
+_start_hooks: List[Callable[[str], None]] = []
+_observers: List[Callable[[str, float, DBStats], None]] = []
+
+
+def add_start_hook(fn: Callable[[str], None]) -> None:
+    if fn not in _start_hooks:
+        _start_hooks.append(fn)
+
+
+def add_observer(fn: Callable[[str, float, DBStats], None]) -> None:
+    if fn not in _observers:
+        _observers.append(fn)
+
+
+def _begin(name: str) -> DBStats:
+    g._db_stats = stats = DBStats()
+    for fn in _start_hooks:
+        fn(name)
+    return stats
+
+
+def current_stats() -> Optional[DBStats]:
+    if not has_app_context():
+        return None
+    return g.get("_db_stats")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["_query_start"].pop()
+    stats = current_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+@event.listens_for(Engine, "commit")
+def _on_commit(conn):
+    stats = current_stats()
+    if stats is not None:
+        stats.commits += 1
+
+
+def _finish(name: str, stats: DBStats, app) -> None:
+    logger.debug("%s %s", name, stats.header_value())
+
+    elapsed = time.perf_counter() - stats.started
+    for fn in _observers:
+        fn(name, elapsed, stats)
+
+    budget = QUERY_BUDGETS.get(name)
+    if budget is not None and stats.round_trips > budget:
+        msg = f"{name}: {stats.round_trips} DB round-trips, budget is {budget} ({stats.header_value()})"
+        if app.config.get("QUERY_BUDGET_STRICT"):
+            raise QueryBudgetExceeded(msg)
+        logger.warning(msg)
+
+
+def observe_event(name: str):
+    """Wrap a Socket.IO handler so its DB work is counted like a request."""
+    key = f"socket:{name}"
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            from flask import current_app
+
+            stats = _begin(key)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                # also when the handler raises: report and check its budget
+                _finish(key, stats, current_app)
+
+        return wrapped
+
+    return decorator
+
+
+def init_app(app) -> None:
+    @app.before_request
+    def _start_db_stats():
+        _begin(request.endpoint or request.path)
+
+    @app.after_request
+    def _report_db_stats(response):
+        stats = current_stats()
+        if stats is None or request.endpoint is None:
+            return response
+
+        if app.config.get("DB_STATS_HEADER"):
+            response.headers["X-DB-Stats"] = stats.header_value()
+        _finish(request.endpoint, stats, app)
+        return response
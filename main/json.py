@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib json module
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Anything orjson can't encode
+    natively (and datetimes, so their format stays Flask's HTTP-date) goes
+    through Flask's usual `default` hook.
+    """
+
+    def _options(self) -> int:
+        opts = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opts |= orjson.OPT_SORT_KEYS
+        return opts
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs.keys() - {"separators", "sort_keys"}:
+            # indent & co: rare, keep exact stdlib behaviour
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if self._app.debug and self.compact is None or self.compact is False:
+            return super().response(*args, **kwargs)  # pretty-printed
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class OrjsonPacketJSON:
+    """`json` module stand-in for python-socketio / python-engineio packets."""
+
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        # separators=(',', ':') is what socketio passes; orjson is always compact
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+
+def init_app(app) -> None:
+    """Use orjson for Flask responses when configured and installed."""
+    if app.config.get("JSON_SERIALIZER") == "orjson" and orjson is not None:
+        app.json = OrjsonProvider(app)
+
+
+def socketio_options(app) -> dict:
+    """Packet serializer options for SocketIO.init_app."""
+    if app.config.get("SOCKETIO_SERIALIZER") == "msgpack":
+        # whole server: clients must load socket.io's msgpack parser build
+        return {"serializer": "msgpack"}
+    if app.config.get("JSON_SERIALIZER") == "orjson" and orjson is not None:
+        return {"json": OrjsonPacketJSON}
+    return {}
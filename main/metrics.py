@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Dict, Tuple
+
+from flask import Response
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # optional; /metrics is simply not served without it
+    prometheus_client = None
+
+from . import instrumentation
+
+logger = logging.getLogger("focusbuddy.metrics")
+
+# Multi-worker: set PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) before
+# the app is imported; every worker then writes its samples to mmap'd
+# files there and /metrics on any worker returns the sum over all of them.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+FANOUT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_enabled = False
+
+if prometheus_client is not None:
+    SOCKET_EVENT_SECONDS = Histogram(
+        "focusbuddy_socket_event_seconds", "Socket.IO handler latency.", ["event"],
+    )
+    HTTP_REQUEST_SECONDS = Histogram(
+        "focusbuddy_http_request_seconds", "HTTP request latency by endpoint.", ["endpoint"],
+    )
+    DB_SECONDS = Counter(
+        "focusbuddy_db_seconds", "Time spent in DB round-trips by endpoint or event.", ["handler"],
+    )
+    DB_QUERIES = Counter(
+        "focusbuddy_db_queries", "DB statements by endpoint or event.", ["handler"],
+    )
+    BROADCAST_RECIPIENTS = Histogram(
+        "focusbuddy_broadcast_recipients", "Local sockets reached per room broadcast.", ["event"],
+        buckets=FANOUT_BUCKETS,
+    )
+    CONNECTED_SOCKETS = Gauge(
+        "focusbuddy_connected_sockets", "Open Socket.IO connections.", multiprocess_mode="livesum",
+    )
+    PRESENCE_ROOMS = Gauge(
+        "focusbuddy_presence_rooms", "Rooms with a present user, per worker (summed).",
+        multiprocess_mode="livesum",
+    )
+    RUNNING_SESSIONS = Gauge(
+        "focusbuddy_running_sessions", "Running sessions tracked by the timer scheduler.",
+        multiprocess_mode="livemax",
+    )
+    # main.db.pool_stats / LRUCache counters are plain totals per worker;
+    # refresh() adds what changed since the last sample
+    DB_POOL_CHECKOUTS = Counter("focusbuddy_db_pool_checkouts", "Connections checked out of the pool.")
+    DB_POOL_WAITS = Counter("focusbuddy_db_pool_waits", "Checkouts that had to queue for a connection.")
+    DB_POOL_WAIT_SECONDS = Counter("focusbuddy_db_pool_wait_seconds", "Time spent queueing for a connection.")
+    DB_POOL_TIMEOUTS = Counter("focusbuddy_db_pool_timeouts", "Checkouts that gave up (pool timeout).")
+    DB_POOL_WAIT_MAX = Gauge(
+        "focusbuddy_db_pool_wait_max_seconds", "Longest wait for a connection since the worker started.",
+        multiprocess_mode="livemax",
+    )
+    DB_POOL_CONNECTIONS = Gauge(
+        "focusbuddy_db_pool_connections", "Pooled connections by state.", ["state"],
+        multiprocess_mode="livesum",
+    )
+    CACHE_HITS = Counter("focusbuddy_cache_hits", "In-process cache hits.", ["cache"])
+    CACHE_MISSES = Counter("focusbuddy_cache_misses", "In-process cache misses.", ["cache"])
+    CACHE_ENTRIES = Gauge(
+        "focusbuddy_cache_entries", "In-process cache size (summed over workers).", ["cache"],
+        multiprocess_mode="livesum",
+    )
+
+# (id of the counter, labels) -> total seen at the previous refresh
+_last_totals: Dict[Tuple[int, Tuple[str, ...]], float] = {}
+
+
+def _observe(name: str, seconds: float, stats) -> None:
+    if name.startswith("socket:"):
+        SOCKET_EVENT_SECONDS.labels(name[7:]).observe(seconds)
+    else:
+        HTTP_REQUEST_SECONDS.labels(name).observe(seconds)
+    if stats.queries:
+        DB_QUERIES.labels(name).inc(stats.queries)
+        DB_SECONDS.labels(name).inc(stats.db_time)
+
+
+def observe_broadcast(event: str, room: str) -> None:
+    """Record how many of this worker's sockets a room emit reaches."""
+    if not _enabled:
+        return
+    from .socketio_ext import socketio
+
+    rooms = socketio.server.manager.rooms.get("/", {})
+    BROADCAST_RECIPIENTS.labels(event).observe(len(rooms.get(room, ())))
+
+
+def _inc_to(counter, total: float, *labels: str) -> None:
+    key = (id(counter), labels)
+    delta = total - _last_totals.get(key, 0)
+    _last_totals[key] = total
+    if delta > 0:
+        (counter.labels(*labels) if labels else counter).inc(delta)
+
+
+def _refresh_pool() -> None:
+    from .db import db, pool_stats
+
+    _inc_to(DB_POOL_CHECKOUTS, pool_stats.checkouts)
+    _inc_to(DB_POOL_WAITS, pool_stats.waits)
+    _inc_to(DB_POOL_WAIT_SECONDS, pool_stats.wait_time)
+    _inc_to(DB_POOL_TIMEOUTS, pool_stats.timeouts)
+    DB_POOL_WAIT_MAX.set(pool_stats.max_wait)
+
+    stats = pool_stats.as_dict(db.engine.pool)
+    if "checked_out" in stats:  # QueuePool only
+        DB_POOL_CONNECTIONS.labels("checked_out").set(stats["checked_out"])
+        DB_POOL_CONNECTIONS.labels("idle").set(stats["idle"])
+        # QueuePool counts unopened slots as negative overflow
+        DB_POOL_CONNECTIONS.labels("overflow").set(max(0, stats["overflow"]))
+
+
+def _refresh_caches() -> None:
+    from auth.service import username_cache
+    from rooms.service import member_count_cache, membership_cache
+    from rooms.state_cache import room_state_cache
+
+    for name, stats in (
+        ("room_state", room_state_cache.stats()),
+        ("membership", membership_cache.stats()),
+        ("member_count", member_count_cache.stats()),
+        ("username", username_cache.stats()),
+    ):
+        _inc_to(CACHE_HITS, stats["hits"], name)
+        _inc_to(CACHE_MISSES, stats["misses"], name)
+        CACHE_ENTRIES.labels(name).set(stats["size"])
+
+
+def refresh() -> None:
+    """Sample the worker-local gauges and counters (needs an app context)."""
+    from rooms.presence import get_presence
+    from rooms.scheduler import timer_scheduler
+    from .socketio_ext import socketio
+
+    CONNECTED_SOCKETS.set(len(socketio.server.eio.sockets))
+    PRESENCE_ROOMS.set(get_presence().room_count())
+    RUNNING_SESSIONS.set(len(timer_scheduler))
+    _refresh_pool()
+    _refresh_caches()
+
+
+def start_refresher(app) -> None:
+    """Keep this worker's gauges current between scrapes (any worker may serve them)."""
+    if not _enabled:
+        return
+    from .socketio_ext import socketio
+
+    interval = app.config["METRICS_REFRESH"]
+
+    def _loop():
+        while True:
+            try:
+                with app.app_context():
+                    refresh()
+            except Exception:
+                logger.exception("metrics refresh failed")
+            socketio.sleep(interval)
+
+    socketio.start_background_task(_loop)
+
+
+def metrics_view():
+    refresh()
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return Response(prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def init_app(app) -> None:
+    global _enabled
+    if not app.config["METRICS_ENABLED"]:
+        return
+    if prometheus_client is None:
+        logger.warning("METRICS_ENABLED but prometheus_client is not installed; /metrics disabled")
+        return
+
+    _enabled = True
+    instrumentation.add_observer(_observe)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import logging
+from typing import Callable, List, Optional, Tuple
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+
+from .db import db
+
+logger = logging.getLogger("focusbuddy.schema")
+
+db_cli = AppGroup("db", help="Schema migrations.")
+
+
+def _create_missing_tables(conn: Connection) -> None:
+    db.metadata.create_all(bind=conn, checkfirst=True)
+
+
+def _create_index(conn: Connection, table: str, name: str, concurrently: bool = False) -> None:
+    """
+    `concurrently` (Postgres, step marked @_concurrent): build without
+    blocking writes to the table.
+    """
+    concurrently = concurrently and conn.dialect.name == "postgresql"
+    for index in db.metadata.tables[table].indexes:
+        if index.name != name:
+            continue
+        if not concurrently:
+            # not checkfirst: SQLite cannot reflect expression indexes
+            conn.execute(CreateIndex(index, if_not_exists=True))
+            return
+
+        # an interrupted concurrent build leaves an INVALID index behind,
+        # which IF NOT EXISTS would happily keep
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).scalar()
+        if invalid:
+            _drop_index(conn, name, concurrently=True)
+
+        # the option lives on the shared metadata; create_all must not see it
+        options = index.dialect_options["postgresql"]
+        options["concurrently"] = True
+        try:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+        finally:
+            options["concurrently"] = False
+        return
+    raise RuntimeError(f"index {name} not found on {table}")
+
+
+def _drop_index(conn: Connection, name: str, concurrently: bool = False) -> None:
+    concurrently = concurrently and conn.dialect.name == "postgresql"
+    conn.execute(text(f'DROP INDEX {"CONCURRENTLY " if concurrently else ""}IF EXISTS "{name}"'))
+
+
+def _concurrent(fn: Callable[[Connection], None]) -> Callable[[Connection], None]:
+    """
+    Mark a step that builds or drops indexes on hot tables: on Postgres it
+    runs in autocommit mode ((CREATE|DROP) INDEX CONCURRENTLY cannot run in
+    a transaction) and must pass concurrently=True to _create_index and
+    _drop_index.
+    """
+    fn.concurrent = True
+    return fn
+
+
+def _m1_rollup_tables(conn: Connection) -> None:
+    # schemas created by the old boot-time create_all() predate these
+    # (the lookup indexes that used to be built here moved to step 4)
+    _create_missing_tables(conn)
+
+
+def _m2_archive_tables(conn: Connection) -> None:
+    for name in ("focus_sessions_archive", "focus_logs_archive"):
+        db.metadata.tables[name].create(bind=conn, checkfirst=True)
+
+
+@_concurrent
+def _m3_session_and_member_indexes(conn: Connection) -> None:
+    _create_index(conn, "focus_sessions", "ix_focus_sessions_room_created", concurrently=True)
+    _create_index(conn, "focus_sessions", "ix_focus_sessions_active", concurrently=True)
+    _create_index(conn, "room_members", "ix_room_members_room_joined", concurrently=True)
+
+
+@_concurrent
+def _m4_login_and_member_lookup_indexes(conn: Connection) -> None:
+    _create_index(conn, "users", "ix_users_username_lower", concurrently=True)
+    _create_index(conn, "room_members", "ix_room_members_user_room", concurrently=True)
+
+
+@_concurrent
+def _m5_drop_session_room_index(conn: Connection) -> None:
+    # redundant with ix_focus_sessions_room_created, and one more write per session
+    _drop_index(conn, "ix_focus_sessions_room_id", concurrently=True)
+
+
+# (version, description, upgrade). Append only; never edit a shipped step.
+# A fresh database is built with create_all() and stamped at the latest
+# version, so each step only has to bring an *older* schema forward, and
+# must be idempotent (step 1's create_all may already have done its work).
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "rollup tables", _m1_rollup_tables),
+    (2, "focus_sessions / focus_logs archive tables", _m2_archive_tables),
+    (3, "focus_sessions (room, created) and active-status indexes, room_members (room, joined)",
+     _m3_session_and_member_indexes),
+    (4, "users lower(username) and room_members (user, room) indexes", _m4_login_and_member_lookup_indexes),
+    (5, "drop focus_sessions (room_id), covered by (room, created)", _m5_drop_session_room_index),
+]
+
+LATEST = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn: Connection) -> Optional[int]:
+    """None when the schema_version table does not exist yet."""
+    try:
+        return conn.execute(text("SELECT version FROM schema_version")).scalar()
+    except Exception:
+        conn.rollback()
+        return None
+
+
+def _stamp(conn: Connection, version: int) -> None:
+    conn.execute(text("DELETE FROM schema_version"))
+    conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
+
+
+def upgrade() -> Tuple[Optional[int], int]:
+    """Bring the schema to LATEST; returns (from_version, to_version)."""
+    with db.engine.begin() as conn:
+        version = current_version(conn)
+
+    if version is None:
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+            if not inspect(conn).has_table("users"):
+                _create_missing_tables(conn)
+                _stamp(conn, LATEST)
+                return None, LATEST
+            # pre-migrations schema built by create_all() at boot
+            _stamp(conn, 0)
+        version = 0
+
+    # one transaction per step, so a long step does not hold the locks of
+    # the ones before it
+    start = version
+    for step, description, fn in MIGRATIONS:
+        if step <= version:
+            continue
+        logger.info("migrating schema to %s: %s", step, description)
+        if getattr(fn, "concurrent", False) and db.engine.dialect.name == "postgresql":
+            with db.engine.connect() as conn:
+                fn(conn.execution_options(isolation_level="AUTOCOMMIT"))
+            # steps are idempotent: a crash before this stamp just reruns it
+            with db.engine.begin() as conn:
+                _stamp(conn, step)
+        else:
+            with db.engine.begin() as conn:
+                fn(conn)
+                _stamp(conn, step)
+        version = step
+
+    return start, version
+
+
+def check_schema(app) -> bool:
+    """
+    The only schema work done at startup: one SELECT. Logs (or raises,
+    with SCHEMA_CHECK_STRICT) when migrations have not been applied.
+    """
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                version = current_version(conn)
+        except Exception:
+            logger.exception("schema check: database unreachable")
+            return False
+
+    if version == LATEST:
+        return True
+
+    msg = f"database schema is at version {version}, code expects {LATEST}; run `flask db upgrade`"
+    if app.config.get("SCHEMA_CHECK_STRICT"):
+        raise RuntimeError(msg)
+    logger.error(msg)
+    return False
+
+
+@db_cli.command("upgrade")
+def upgrade_command():
+    """Apply pending schema migrations."""
+    start, end = upgrade()
+    if start is None:
+        click.echo(f"created schema at version {end}")
+    elif start == end:
+        click.echo(f"schema already at version {end}")
+    else:
+        click.echo(f"schema migrated {start} -> {end}")
+
+
+@db_cli.command("current")
+def current_command():
+    """Print the schema version of the database."""
+    with db.engine.connect() as conn:
+        click.echo(f"{current_version(conn)} (latest {LATEST})")
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Optional
+
+from gevent import monkey
+
+logger = logging.getLogger("focusbuddy.profiler")
+
+# Under gevent every greenlet runs on the main OS thread, so a sampler
+# greenlet would only run when the hub is free, i.e. never while the
+# worker is lagging. The sampler is a real OS thread instead, reading
+# the main thread's current frame (whichever greenlet is on the CPU).
+_start_thread = monkey.get_original("_thread", "start_new_thread")
+_get_ident = monkey.get_original("_thread", "get_ident")
+_sleep = monkey.get_original("time", "sleep")
+
+
+class StackSampler:
+    """
+    Samples the worker's running stack every `interval` seconds and
+    writes the aggregate in folded format (one "a;b;c count" line per
+    stack), ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005, out_dir: Optional[str] = None, max_seconds: float = 60):
+        self.interval = interval
+        self.out_dir = out_dir or tempfile.gettempdir()
+        self.max_seconds = max_seconds
+        self.running = False
+        self._target: Optional[int] = None
+        self._stacks: Counter = Counter()
+        self._started = 0.0
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._target = _get_ident()
+        self._stacks = Counter()
+        self._started = time.time()
+        self.running = True
+        _start_thread(self._run, ())
+        logger.warning("profiler started in pid %s (every %.1f ms)", os.getpid(), self.interval * 1000)
+
+    def stop(self) -> Optional[str]:
+        """Stops sampling; returns the path of the folded-stacks file."""
+        if self.running:
+            self.running = False
+            time.sleep(self.interval * 2)  # let the thread take its last sample
+        if not self._stacks:
+            return None
+        stacks, self._stacks = self._stacks, Counter()
+
+        path = os.path.join(self.out_dir, f"focusbuddy-profile-{os.getpid()}-{int(self._started)}.folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.warning("profiler stopped: %s samples written to %s", sum(stacks.values()), path)
+        return path
+
+    def toggle(self) -> None:
+        # samples left by a run that hit max_seconds are written, not dropped
+        if self.running or self._stacks:
+            self.stop()
+        else:
+            self.start()
+
+    def _run(self) -> None:
+        deadline = self._started + self.max_seconds
+        while self.running:
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self._stacks[_fold(frame)] += 1
+            if time.time() > deadline:
+                # no logging here: gevent's locks are not safe off the hub thread
+                self.running = False
+                break
+            _sleep(self.interval)
+
+
+def _fold(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+sampler = StackSampler()
+
+
+def install_signal_handler(app) -> None:
+    """
+    Per worker: `kill -USR2 <worker pid>` starts sampling, a second USR2
+    stops it and writes the folded stacks to PROFILE_DIR.
+    """
+    if not app.config["PROFILER_SIGNAL"]:
+        return
+    import gevent
+
+    sampler.interval = app.config["PROFILE_INTERVAL_MS"] / 1000.0
+    sampler.out_dir = app.config["PROFILE_DIR"] or tempfile.gettempdir()
+    sampler.max_seconds = app.config["PROFILE_MAX_SECONDS"]
+    gevent.signal_handler(signal.SIGUSR2, lambda: gevent.spawn(sampler.toggle))
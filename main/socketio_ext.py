@@ -7,4 +7,14 @@ socketio = SocketIO(
     async_mode="gevent",
     logger=False,
     engineio_logger=False,
-)
\ No newline at end of file
+)
+
+
+def init_socketio(app) -> None:
+    from .json import socketio_options
+
+    options = socketio_options(app)
+    if app.config.get("SOCKETIO_MESSAGE_QUEUE"):
+        # several workers: emits to a room must reach sockets on every worker
+        options["message_queue"] = app.config["SOCKETIO_MESSAGE_QUEUE"]
+    socketio.init_app(app, **options)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from flask import before_render_template, g, has_app_context, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import instrumentation
+
+logger = logging.getLogger("focusbuddy.trace")
+
+_enabled = False
+_slow_seconds = 0.25
+_max_spans = 500
+_file: Optional[str] = None
+_file_lock = threading.Lock()
+
+
+class Trace:
+    """Timed spans of one HTTP request or Socket.IO event."""
+
+    __slots__ = ("trace_id", "name", "started", "at", "spans", "dropped", "_open")
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.at = datetime.utcnow()
+        # (kind, label, start offset s, duration s)
+        self.spans: List[Tuple[str, str, float, float]] = []
+        self.dropped = 0
+        self._open: List[float] = []
+
+    def add(self, kind: str, label: str, started: float, duration: float) -> None:
+        if len(self.spans) >= _max_spans:
+            self.dropped += 1
+            return
+        self.spans.append((kind, label, started - self.started, duration))
+
+    def as_dict(self, duration: float, stats) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "at": self.at.isoformat(timespec="milliseconds") + "Z",
+            "duration_ms": round(duration * 1000, 2),
+            "db_ms": round(stats.db_time * 1000, 2),
+            "queries": stats.queries,
+            "spans": [
+                {"kind": k, "label": label, "start_ms": round(s * 1000, 2), "duration_ms": round(d * 1000, 2)}
+                for k, label, s, d in self.spans
+            ],
+            "dropped_spans": self.dropped,
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    if not _enabled or not has_app_context():
+        return None
+    return g.get("_trace")
+
+
+@contextmanager
+def span(kind: str, label: str):
+    """Time a block as a span of the current trace (no-op when not tracing)."""
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(kind, label, started, time.perf_counter() - started)
+
+
+def _begin(name: str) -> None:
+    g._trace = Trace(name)
+
+
+def _end(name: str, seconds: float, stats) -> None:
+    trace = g.pop("_trace", None)
+    if trace is None or seconds < _slow_seconds:
+        return
+    _write(trace.as_dict(seconds, stats))
+
+
+def _write(record: dict) -> None:
+    line = json.dumps(record, separators=(",", ":"))
+    if not _file:
+        logger.warning(line)
+        return
+    with _file_lock, open(_file, "a") as f:
+        f.write(line + "\n")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_trace() is not None:
+        conn.info.setdefault("_trace_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace()
+    stack = conn.info.get("_trace_start")
+    if trace is None or not stack:
+        return
+    started = stack.pop()
+    trace.add("sql", " ".join(statement.split())[:200], started, time.perf_counter() - started)
+
+
+def _before_render(sender, template, context, **extra):
+    trace = current_trace()
+    if trace is not None:
+        trace._open.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    trace = current_trace()
+    if trace is not None and trace._open:
+        started = trace._open.pop()
+        trace.add("render", template.name or "<string>", started, time.perf_counter() - started)
+
+
+def init_app(app) -> None:
+    """
+    TRACING_ENABLED: every request/event gets a trace id (X-Trace-Id on
+    HTTP responses); those slower than TRACE_SLOW_MS are written as one
+    JSON line each to TRACE_FILE (or the focusbuddy.trace logger).
+    """
+    global _enabled, _slow_seconds, _max_spans, _file
+    if not app.config["TRACING_ENABLED"]:
+        return
+
+    _enabled = True
+    _slow_seconds = app.config["TRACE_SLOW_MS"] / 1000.0
+    _max_spans = app.config["TRACE_MAX_SPANS"]
+    _file = app.config["TRACE_FILE"] or None
+
+    instrumentation.add_start_hook(_begin)
+    instrumentation.add_observer(_end)
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.after_request
+    def _trace_header(response):
+        trace = g.get("_trace")
+        if trace is not None:
+            response.headers["X-Trace-Id"] = trace.trace_id
+        return response
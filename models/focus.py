@@ -3,12 +3,15 @@ from __future__ import annotations
 from datetime import datetime
 from main.db import db
 
+ACTIVE_STATUSES = ("running", "paused")
+
 
 class FocusSession(db.Model):
     __tablename__ = "focus_sessions"
 
     id = db.Column(db.Integer, primary_key=True)
-    room_id = db.Column(db.Integer, nullable=False, index=True)
+    # no index of its own: ix_focus_sessions_room_created leads with it
+    room_id = db.Column(db.Integer, nullable=False)
     started_by = db.Column(db.Integer, nullable=False)
 
     # idle | running | paused | ended
@@ -25,26 +28,57 @@ class FocusSession(db.Model):
 
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (
+        # latest session of a room (room state, rooms index badge)
+        db.Index("ix_focus_sessions_room_created", "room_id", created_at.desc()),
+        # active session of a room; only running/paused rows, so it stays
+        # tiny however much history piles up. Queries must spell the IN list
+        # as literals (see active_status_clause) for the planner to use it.
+        db.Index(
+            "ix_focus_sessions_active",
+            "room_id",
+            "created_at",
+            postgresql_where=status.in_(ACTIVE_STATUSES),
+            sqlite_where=status.in_(ACTIVE_STATUSES),
+        ),
+    )
+
+    @classmethod
+    def active_status_clause(cls):
+        """status IN ('running', 'paused') with inline literals, matching ix_focus_sessions_active."""
+        return cls.status.in_(db.bindparam("active_statuses", ACTIVE_STATUSES, expanding=True, literal_execute=True))
+
     def remaining_seconds(self) -> int:
-        if self.status == "ended":
-            return 0
+        return compute_remaining_seconds(
+            self.status,
+            self.duration_seconds,
+            self.started_at,
+            self.paused_at,
+            self.paused_seconds or 0,
+        )
+
+
+def compute_remaining_seconds(status, duration_seconds, started_at, paused_at, paused_seconds) -> int:
+    """Shared by FocusSession and the cached session snapshots."""
+    if status == "ended":
+        return 0
 
-        if self.status == "idle" or not self.started_at:
-            return self.duration_seconds
+    if status == "idle" or not started_at:
+        return duration_seconds
 
-        now = datetime.utcnow()
+    now = datetime.utcnow()
 
-        # paused
-        if self.status == "paused" and self.paused_at:
-            elapsed = (self.paused_at - self.started_at).total_seconds()
-        else:
-            elapsed = (now - self.started_at).total_seconds()
+    # paused
+    if status == "paused" and paused_at:
+        elapsed = (paused_at - started_at).total_seconds()
+    else:
+        elapsed = (now - started_at).total_seconds()
 
-        elapsed -= self.paused_seconds
+    elapsed -= paused_seconds
 
-        remaining = int(self.duration_seconds - elapsed)
+    remaining = int(duration_seconds - elapsed)
 
-        return max(0, remaining)
+    return max(0, remaining)
 
 class FocusLog(db.Model):
     __tablename__ = "focus_logs"
@@ -57,4 +91,59 @@ class FocusLog(db.Model):
 
     focused_seconds = db.Column(db.Integer, nullable=False, default=0)
 
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class UserDailyFocus(db.Model):
+    """Per-user daily rollup of FocusLog, maintained alongside every insert."""
+    __tablename__ = "user_daily_focus"
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+
+    focused_seconds = db.Column(db.Integer, nullable=False, default=0)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class RoomUserDailyFocus(db.Model):
+    """Per-room, per-user daily rollup; room totals and leaderboards read this."""
+    __tablename__ = "room_user_daily_focus"
+
+    room_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+
+    focused_seconds = db.Column(db.Integer, nullable=False, default=0)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class FocusSessionArchive(db.Model):
+    """Old finished sessions moved out of focus_sessions (stats.retention)."""
+    __tablename__ = "focus_sessions_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    room_id = db.Column(db.Integer, nullable=False, index=True)
+    started_by = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    duration_seconds = db.Column(db.Integer, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    ended_at = db.Column(db.DateTime, nullable=True)
+    paused_at = db.Column(db.DateTime, nullable=True)
+    paused_seconds = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FocusLogArchive(db.Model):
+    """focus_logs rows of archived sessions; still counted by stats backfill."""
+    __tablename__ = "focus_logs_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    room_id = db.Column(db.Integer, nullable=False, index=True)
+    session_id = db.Column(db.Integer, nullable=False, index=True)
+    focused_seconds = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -10,5 +10,10 @@ class User(db.Model):
 
     password_hash = db.Column(db.String(255), nullable=False)
 
+    __table_args__ = (
+        # login matches usernames case-insensitively; emails are stored lowercased
+        db.Index("ix_users_username_lower", db.func.lower(username)),
+    )
+
     def __repr__(self) -> str:
         return f"<User {self.username}>"
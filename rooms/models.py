@@ -21,4 +21,8 @@ class RoomMember(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("room_id", "user_id", name="uq_room_member"),
+        # "rooms of a user" lookups (rooms index) walk this one
+        db.Index("ix_room_members_user_room", "user_id", "room_id"),
+        # members page of a room, keyset on (joined_at, id)
+        db.Index("ix_room_members_room_joined", "room_id", "joined_at", "id"),
     )
\ No newline at end of file
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+
+try:
+    import redis
+except ImportError:  # optional, only needed for PRESENCE_BACKEND=redis
+    redis = None
+
+
+class PresenceBackend:
+    """
+    Who is currently in which room.
+
+    Every worker owns the entries for the sockets connected to it and
+    refreshes their heartbeat timestamps; entries whose heartbeat is older
+    than `ttl` are ignored and eventually purged, so a crashed worker's
+    users disappear on their own.
+    """
+
+    def __init__(self, ttl: float = 30):
+        self.ttl = ttl
+        # Entries contributed by *this* worker, indexed by socket sid so a
+        # disconnect only touches the rooms that connection joined, and
+        # refcounted per (room, user) so a user stays present while any of
+        # their tabs is still open.
+        self._sid_user: Dict[str, int] = {}
+        self._sid_rooms: Dict[str, Set[int]] = {}
+        self._refs: Dict[int, Dict[int, int]] = {}
+
+    def join(self, sid: str, room_id: int, user_id: int) -> bool:
+        """Returns True if the user just became present in the room."""
+        rooms = self._sid_rooms.setdefault(sid, set())
+        if room_id in rooms:
+            return False
+        rooms.add(room_id)
+        self._sid_user[sid] = user_id
+
+        refs = self._refs.setdefault(room_id, {})
+        refs[user_id] = refs.get(user_id, 0) + 1
+        if refs[user_id] > 1:
+            return False
+
+        self._store_join(room_id, user_id)
+        return True
+
+    def leave(self, sid: str, room_id: int) -> bool:
+        """Returns True if the user's last tab in the room just left."""
+        rooms = self._sid_rooms.get(sid)
+        if not rooms or room_id not in rooms:
+            return False
+        rooms.discard(room_id)
+        user_id = self._sid_user[sid]
+        if not rooms:
+            self._sid_rooms.pop(sid, None)
+            self._sid_user.pop(sid, None)
+        return self._release(room_id, user_id)
+
+    def disconnect(self, sid: str) -> List[int]:
+        """Drops every room of a connection; returns rooms the user left."""
+        rooms = self._sid_rooms.pop(sid, None)
+        user_id = self._sid_user.pop(sid, None)
+        if not rooms or user_id is None:
+            return []
+        return [rid for rid in rooms if self._release(rid, user_id)]
+
+    def _release(self, room_id: int, user_id: int) -> bool:
+        refs = self._refs.get(room_id)
+        if not refs or user_id not in refs:
+            return False
+
+        refs[user_id] -= 1
+        if refs[user_id] > 0:
+            return False
+
+        del refs[user_id]
+        if not refs:
+            del self._refs[room_id]
+        self._store_leave(room_id, user_id)
+        return True
+
+    def room_count(self) -> int:
+        """Rooms with at least one socket on this worker."""
+        return len(self._refs)
+
+    def members(self, room_id: int) -> Set[int]:
+        raise NotImplementedError
+
+    def heartbeat(self) -> None:
+        raise NotImplementedError
+
+    def _store_join(self, room_id: int, user_id: int) -> None:
+        raise NotImplementedError
+
+    def _store_leave(self, room_id: int, user_id: int) -> None:
+        raise NotImplementedError
+
+
+class MemoryPresence(PresenceBackend):
+    """Single-process store (the original PRESENCE dict, plus timestamps)."""
+
+    def __init__(self, ttl: float = 30):
+        super().__init__(ttl)
+        self._seen: Dict[int, Dict[int, float]] = {}
+
+    def members(self, room_id: int) -> Set[int]:
+        seen = self._seen.get(room_id)
+        if not seen:
+            return set()
+        cutoff = time.time() - self.ttl
+        return {uid for uid, ts in seen.items() if ts >= cutoff}
+
+    def heartbeat(self) -> None:
+        now = time.time()
+        for room_id, users in self._refs.items():
+            seen = self._seen.setdefault(room_id, {})
+            for uid in users:
+                seen[uid] = now
+
+        cutoff = now - self.ttl
+        for room_id in list(self._seen):
+            seen = self._seen[room_id]
+            for uid in [u for u, ts in seen.items() if ts < cutoff]:
+                del seen[uid]
+            if not seen:
+                del self._seen[room_id]
+
+    def _store_join(self, room_id: int, user_id: int) -> None:
+        self._seen.setdefault(room_id, {})[user_id] = time.time()
+
+    def _store_leave(self, room_id: int, user_id: int) -> None:
+        seen = self._seen.get(room_id)
+        if seen is not None:
+            seen.pop(user_id, None)
+            if not seen:
+                self._seen.pop(room_id, None)
+
+
+class RedisPresence(PresenceBackend):
+    """
+    Shared store for several workers, on anything that speaks the Redis
+    protocol (fakeredis works as a local stand-in).
+
+    One sorted set per room; members are "<worker>:<user_id>" scored by
+    their last heartbeat, so each worker's contribution expires separately.
+    """
+
+    def __init__(self, client, ttl: float = 30, worker_id: Optional[str] = None):
+        super().__init__(ttl)
+        self.client = client
+        self.worker_id = worker_id or f"{socket.gethostname()}.{os.getpid()}.{uuid.uuid4().hex[:6]}"
+
+    @staticmethod
+    def _key(room_id: int) -> str:
+        return f"presence:room:{room_id}"
+
+    def _member(self, user_id: int) -> str:
+        return f"{self.worker_id}:{user_id}"
+
+    def members(self, room_id: int) -> Set[int]:
+        key = self._key(room_id)
+        cutoff = time.time() - self.ttl
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(key, "-inf", f"({cutoff}")
+        pipe.zrange(key, 0, -1)
+        _, raw = pipe.execute()
+
+        users: Set[int] = set()
+        for m in raw:
+            if isinstance(m, bytes):
+                m = m.decode()
+            users.add(int(m.rsplit(":", 1)[1]))
+        return users
+
+    def heartbeat(self) -> None:
+        if not self._refs:
+            return
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for room_id, users in self._refs.items():
+            key = self._key(room_id)
+            pipe.zadd(key, {self._member(uid): now for uid in users})
+            pipe.expire(key, int(self.ttl * 2))
+        pipe.execute()
+
+    def _store_join(self, room_id: int, user_id: int) -> None:
+        key = self._key(room_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(key, {self._member(user_id): time.time()})
+        pipe.expire(key, int(self.ttl * 2))
+        pipe.execute()
+
+    def _store_leave(self, room_id: int, user_id: int) -> None:
+        self.client.zrem(self._key(room_id), self._member(user_id))
+
+
+_backend: PresenceBackend = MemoryPresence()
+
+
+def get_presence() -> PresenceBackend:
+    return _backend
+
+
+def init_presence(app, client=None) -> PresenceBackend:
+    """Pick the backend from config (no I/O, safe before a fork)."""
+    global _backend
+
+    kind = app.config.get("PRESENCE_BACKEND", "memory")
+    ttl = app.config.get("PRESENCE_TTL", 30)
+
+    if kind == "redis":
+        if client is None:
+            if redis is None:
+                raise RuntimeError("PRESENCE_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(app.config["PRESENCE_REDIS_URL"])
+        _backend = RedisPresence(client, ttl=ttl)
+    elif kind == "memory":
+        _backend = MemoryPresence(ttl=ttl)
+    else:
+        raise RuntimeError(f"Unknown PRESENCE_BACKEND: {kind}")
+
+    app.extensions["presence"] = _backend
+    return _backend
+
+
+def start_heartbeat(app) -> None:
+    """Run in each worker process, after any fork."""
+    from main.socketio_ext import socketio
+
+    backend = _backend
+    interval = app.config.get("PRESENCE_HEARTBEAT", backend.ttl / 3)
+
+    def _heartbeat_loop():
+        while _backend is backend:
+            socketio.sleep(interval)
+            try:
+                backend.heartbeat()
+            except Exception:
+                app.logger.exception("presence heartbeat failed")
+
+    socketio.start_background_task(_heartbeat_loop)
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-from flask import render_template, request, redirect, url_for, flash, session, jsonify
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, current_app
 
+from auth.service import get_usernames
 from main.auth_utils import login_required
 from main.db import db
-from models.user import User
 
 from . import rooms_bp
-from .models import RoomMember
+from .presence import get_presence
+from .state_cache import room_state_cache, state_version
 from .service import (
     create_room,
     get_user_rooms,
@@ -17,10 +18,14 @@ from .service import (
     get_room_members,
     remove_member,
     delete_room,
+    get_membership,
+    is_room_member,
+    decode_cursor,
+    get_room_for_member,
+    get_member_count,
 )
 from .sessions_service import (
-    get_active_session,
-    get_latest_session,
+    get_room_state,
     start_session,
     pause_session,
     resume_session,
@@ -33,8 +38,14 @@ from .sessions_service import (
 @login_required
 def rooms_index():
     user_id = session["user_id"]
-    rooms = get_user_rooms(user_id)
-    return render_template("rooms/index.html", rooms=rooms)
+    before = decode_cursor(request.args.get("before") or "")
+    rooms, next_cursor = get_user_rooms(user_id, limit=24, before=before)
+    return render_template(
+        "rooms/index.html",
+        rooms=rooms,
+        next_cursor=next_cursor,
+        is_first_page=before is None,
+    )
 
 
 @rooms_bp.get("/rooms/create")
@@ -82,8 +93,7 @@ def rooms_join_post():
 
     add_member(room, session["user_id"])
 
-    is_member = RoomMember.query.filter_by(room_id=room.id, user_id=session["user_id"]).first()
-    if not is_member:
+    if not is_room_member(room.id, session["user_id"]):
         flash("Could not join the room. Please try again.", "error")
         return redirect(url_for("rooms.rooms_join_page"))
 
@@ -94,19 +104,18 @@ def rooms_join_post():
 @rooms_bp.get("/rooms/<int:room_id>")
 @login_required
 def room_detail(room_id: int):
-    room = get_room(room_id)
+    user_id = session["user_id"]
+
+    room, is_member = get_room_for_member(room_id, user_id)
     if not room:
         flash("Room not found.", "error")
         return redirect(url_for("rooms.rooms_index"))
 
-    user_id = session["user_id"]
-
-    is_member = RoomMember.query.filter_by(room_id=room.id, user_id=user_id).first()
     if not is_member:
         flash("You are not a member of this room.", "error")
         return redirect(url_for("rooms.rooms_index"))
 
-    members = get_room_members(room)
+    members, next_cursor = get_room_members(room, limit=50)
     is_owner = (user_id == room.owner_id)
 
     invite_link = url_for(
@@ -119,12 +128,34 @@ def room_detail(room_id: int):
         "rooms/room.html",
         room=room,
         members=members,
-        member_count=len(members),
+        members_next=next_cursor,
+        member_count=get_member_count(room.id),
         is_owner=is_owner,
         invite_link=invite_link,
     )
 
 
+@rooms_bp.get("/rooms/<int:room_id>/members")
+@login_required
+def room_members(room_id: int):
+    room, is_member = get_room_for_member(room_id, session["user_id"])
+    if not room:
+        return jsonify({"error": "Room not found"}), 404
+
+    if not is_member:
+        return jsonify({"error": "Forbidden"}), 403
+
+    after = decode_cursor(request.args.get("after") or "")
+    members, next_cursor = get_room_members(room, limit=50, after=after)
+    return jsonify({
+        "members": [
+            {"user_id": uid, "username": uname, "is_owner": owner}
+            for uid, uname, owner in members
+        ],
+        "next": next_cursor,
+    })
+
+
 @rooms_bp.post("/rooms/<int:room_id>/leave")
 @login_required
 def room_leave(room_id: int):
@@ -139,8 +170,7 @@ def room_leave(room_id: int):
         flash("Owner cannot leave the room. You can delete the room instead.", "error")
         return redirect(url_for("rooms.room_detail", room_id=room.id))
 
-    is_member = RoomMember.query.filter_by(room_id=room.id, user_id=user_id).first()
-    if not is_member:
+    if not is_room_member(room.id, user_id):
         flash("You are not a member of this room.", "error")
         return redirect(url_for("rooms.rooms_index"))
 
@@ -170,41 +200,69 @@ def room_delete(room_id: int):
 @rooms_bp.get("/rooms/<int:room_id>/session")
 @login_required
 def room_session_status(room_id: int):
-    room = get_room(room_id)
-    if not room:
+    membership = get_membership(room_id, session["user_id"])
+    if membership is None:
         return jsonify({"error": "Room not found"}), 404
 
-    is_member = RoomMember.query.filter_by(room_id=room_id, user_id=session["user_id"]).first()
-    if not is_member:
+    if not membership[0]:
         return jsonify({"error": "Forbidden"}), 403
 
-    s = get_active_session(room_id) or get_latest_session(room_id)
+    # Long-poll: ?wait=<seconds> holds the request until the state changes.
+    try:
+        wait = float(request.args.get("wait") or 0)
+    except ValueError:
+        wait = 0
+    wait = max(0.0, min(wait, current_app.config["SESSION_LONG_POLL_MAX"]))
+
+    # watch before reading: a change between the read and the wait
+    # (db.session.close() can yield) must still wake us
+    changed = room_state_cache.watch(room_id) if wait else None
+
+    s = get_room_state(room_id)
+    version = state_version(s)
+
+    if request.if_none_match.contains_weak(version):
+        if changed is not None:
+            # don't keep a pooled connection checked out while we sleep
+            db.session.close()
+            changed.wait(wait)
+            s = get_room_state(room_id)
+            version = state_version(s)
+
+        if request.if_none_match.contains_weak(version):
+            resp = current_app.response_class(status=304)
+            resp.set_etag(version, weak=True)
+            resp.headers["Cache-Control"] = "no-cache"
+            return resp
 
     if not s:
-        return jsonify({
+        resp = jsonify({
             "status": "idle",
             "duration_seconds": 25 * 60,
             "remaining_seconds": 25 * 60,
         })
+    else:
+        resp = jsonify({
+            "status": s.status,
+            "duration_seconds": s.duration_seconds,
+            "remaining_seconds": s.remaining_seconds(),
+            "started_by": s.started_by,
+        })
 
-    return jsonify({
-        "status": s.status,
-        "duration_seconds": s.duration_seconds,
-        "remaining_seconds": s.remaining_seconds(),
-        "started_by": s.started_by,
-    })
+    resp.set_etag(version, weak=True)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 
 @rooms_bp.post("/rooms/<int:room_id>/session/start")
 @login_required
 def room_session_start(room_id: int):
-    room = get_room(room_id)
-    if not room:
+    membership = get_membership(room_id, session["user_id"])
+    if membership is None:
         flash("Room not found.", "error")
         return redirect(url_for("rooms.rooms_index"))
 
-    is_member = RoomMember.query.filter_by(room_id=room_id, user_id=session["user_id"]).first()
-    if not is_member:
+    if not membership[0]:
         flash("You are not a member of this room.", "error")
         return redirect(url_for("rooms.rooms_index"))
 
@@ -223,9 +281,7 @@ def room_session_start(room_id: int):
 @rooms_bp.post("/rooms/<int:room_id>/session/pause")
 @login_required
 def room_session_pause(room_id: int):
-    s = get_active_session(room_id)
-    if s:
-        pause_session(s)
+    if pause_session(room_id):
         flash("Paused ⏸️", "info")
     return redirect(url_for("rooms.room_detail", room_id=room_id))
 
@@ -233,9 +289,7 @@ def room_session_pause(room_id: int):
 @rooms_bp.post("/rooms/<int:room_id>/session/resume")
 @login_required
 def room_session_resume(room_id: int):
-    s = get_active_session(room_id)
-    if s:
-        resume_session(s)
+    if resume_session(room_id):
         flash("Resumed ▶️", "success")
     return redirect(url_for("rooms.room_detail", room_id=room_id))
 
@@ -243,9 +297,7 @@ def room_session_resume(room_id: int):
 @rooms_bp.post("/rooms/<int:room_id>/session/reset")
 @login_required
 def room_session_reset(room_id: int):
-    s = get_active_session(room_id) or get_latest_session(room_id)
-    if s:
-        reset_session(s, session["user_id"])
+    if reset_session(room_id, session["user_id"]):
         flash("Reset 🔄", "info")
     return redirect(url_for("rooms.room_detail", room_id=room_id))
 
@@ -253,9 +305,7 @@ def room_session_reset(room_id: int):
 @rooms_bp.post("/rooms/<int:room_id>/session/end")
 @login_required
 def room_session_end(room_id: int):
-    s = get_active_session(room_id) or get_latest_session(room_id)
-    if s:
-        end_session(s, session["user_id"])
+    if end_session(room_id, session["user_id"]):
         flash("Session ended ✅", "success")
     return redirect(url_for("rooms.room_detail", room_id=room_id))
 
@@ -263,21 +313,37 @@ def room_session_end(room_id: int):
 @rooms_bp.get("/rooms/<int:room_id>/presence")
 @login_required
 def room_presence(room_id: int):
-    room = get_room(room_id)
-    if not room:
+    """
+    Who is online in the room right now, from the live presence store.
+    ?count_only=1 returns just the count; otherwise users are paged by
+    user id with ?after=<user_id>&limit=<n>.
+    """
+    membership = get_membership(room_id, session["user_id"])
+    if membership is None:
         return jsonify({"error": "Room not found"}), 404
 
-    is_member = RoomMember.query.filter_by(room_id=room_id, user_id=session["user_id"]).first()
-    if not is_member:
+    if not membership[0]:
         return jsonify({"error": "Forbidden"}), 403
 
-    rows = (
-        db.session.query(User.username, RoomMember.user_id)
-        .join(RoomMember, RoomMember.user_id == User.id)
-        .filter(RoomMember.room_id == room_id)
-        .order_by(RoomMember.joined_at.asc())
-        .all()
-    )
+    online = get_presence().members(room_id)
+    if request.args.get("count_only") == "1":
+        return jsonify({"count": len(online)})
+
+    try:
+        after = int(request.args.get("after") or 0)
+        limit = int(request.args.get("limit") or 100)
+    except ValueError:
+        after, limit = 0, 100
+    limit = max(1, min(limit, 500))
+
+    page = sorted(uid for uid in online if uid > after)[:limit + 1]
+    has_more = len(page) > limit
+    page = page[:limit]
 
-    members = [{"user_id": uid, "username": uname} for (uname, uid) in rows]
-    return jsonify({"count": len(members), "members": members})
\ No newline at end of file
+    names = get_usernames(page)
+    members = [{"user_id": uid, "username": names.get(uid)} for uid in page]
+    return jsonify({
+        "count": len(online),
+        "members": members,
+        "next": page[-1] if has_more else None,
+    })
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import heapq
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from gevent.event import Event
+
+from main.db import db
+from models.focus import FocusSession
+from .models import Room
+from .state_cache import SessionSnapshot
+
+
+def session_deadline(s) -> Optional[datetime]:
+    """When a running session reaches zero (None if it is not running)."""
+    if s.status != "running" or not s.started_at:
+        return None
+    return s.started_at + timedelta(seconds=s.duration_seconds + (s.paused_seconds or 0))
+
+
+class TimerScheduler:
+    """
+    One greenlet per worker that ends running sessions at their deadline.
+
+    Deadlines live in a heap; rescheduling or cancelling a room just
+    replaces its entry in `_deadlines` and leaves the old heap item to be
+    skipped when it surfaces, so every operation is O(log n) no matter how
+    many rooms are running.
+    """
+
+    # seconds before retrying a failed expiry, doubling up to RETRY_MAX
+    RETRY_BASE = 1.0
+    RETRY_MAX = 60.0
+
+    def __init__(self):
+        self.app = None
+        self._heap: List[Tuple[datetime, int, int]] = []
+        # room_id -> (deadline, session_id), the only entry that counts
+        self._deadlines: Dict[int, Tuple[datetime, int]] = {}
+        self._wake = Event()
+        self._started = False
+        self._on_expired: List[Callable[[SessionSnapshot], None]] = []
+        # session_id -> consecutive failed expiries
+        self._failures: Dict[int, int] = {}
+
+    def init_app(self, app) -> None:
+        self.app = app
+        app.extensions["timer_scheduler"] = self
+
+    def expired_handler(self, fn: Callable[[SessionSnapshot], None]):
+        """Register a callback run (in app context) after a session expired."""
+        self._on_expired.append(fn)
+        return fn
+
+    def track(self, s) -> None:
+        """Called on every session state change (write-through)."""
+        deadline = session_deadline(s)
+        if deadline is None:
+            self.cancel(s.room_id)
+        else:
+            self.schedule(s.room_id, s.id, deadline)
+
+    def schedule(self, room_id: int, session_id: int, deadline: datetime) -> None:
+        self._deadlines[room_id] = (deadline, session_id)
+        heapq.heappush(self._heap, (deadline, room_id, session_id))
+
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._compact()
+        if self._heap[0][1] == room_id:
+            self._wake.set()
+
+    def cancel(self, room_id: int) -> None:
+        self._deadlines.pop(room_id, None)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def start(self) -> None:
+        if self._started or self.app is None:
+            return
+        self._started = True
+
+        from main.socketio_ext import socketio
+
+        socketio.start_background_task(self._run)
+
+    def _compact(self) -> None:
+        self._heap = [(d, rid, sid) for rid, (d, sid) in self._deadlines.items()]
+        heapq.heapify(self._heap)
+
+    def _load_running(self) -> None:
+        with self.app.app_context():
+            rows = (
+                FocusSession.query
+                .filter(
+                    FocusSession.status == "running",
+                    # sessions left behind by a deleted room are never expired
+                    db.exists().where(Room.id == FocusSession.room_id),
+                )
+                .all()
+            )
+            for s in rows:
+                deadline = session_deadline(s)
+                current = self._deadlines.get(s.room_id)
+                # a newer session may already have been tracked meanwhile
+                if deadline and (current is None or current[1] < s.id):
+                    self.schedule(s.room_id, s.id, deadline)
+            db.session.remove()
+
+    def _run(self) -> None:
+        try:
+            self._load_running()
+        except Exception:
+            self.app.logger.exception("timer scheduler: loading running sessions failed")
+
+        while True:
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+            now = datetime.utcnow()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, room_id, session_id = heapq.heappop(self._heap)
+                if self._deadlines.get(room_id) != (deadline, session_id):
+                    continue  # stale: rescheduled or cancelled
+                del self._deadlines[room_id]
+                try:
+                    self._expire(session_id)
+                    self._failures.pop(session_id, None)
+                except Exception:
+                    self.app.logger.exception("timer scheduler: expiring session %s failed", session_id)
+                    self._retry(room_id, session_id)
+
+    def _retry(self, room_id: int, session_id: int) -> None:
+        # keep the deadline alive, or a transient DB error would leave the
+        # session running until the next restart
+        if room_id in self._deadlines:
+            return  # rescheduled meanwhile (new session, pause, ...)
+        failures = self._failures[session_id] = self._failures.get(session_id, 0) + 1
+        delay = min(self.RETRY_MAX, self.RETRY_BASE * 2 ** (failures - 1))
+        self.schedule(room_id, session_id, datetime.utcnow() + timedelta(seconds=delay))
+
+    def _expire(self, session_id: int) -> None:
+        from .sessions_service import expire_session
+
+        with self.app.app_context():
+            try:
+                snap = expire_session(session_id)
+                if snap is None:
+                    return
+                for fn in self._on_expired:
+                    fn(snap)
+            finally:
+                db.session.remove()
+
+timer_scheduler = TimerScheduler()
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
 import secrets
+from datetime import datetime
 from typing import Optional, List, Tuple
 
 from sqlalchemy.exc import IntegrityError
 
+from main.cache import LRUCache, MISSING
 from main.db import db
+from models.focus import FocusSession
 from models.user import User
 from .models import Room, RoomMember
+from .scheduler import timer_scheduler
+from .state_cache import room_state_cache
+
+# (room_id, user_id) -> (is_member, is_owner), or None when the room is gone.
+# Shared by HTTP routes and socket handlers; the TTL bounds how long another
+# worker's membership change can go unnoticed.
+membership_cache = LRUCache(max_size=16384, ttl=30)
+
+# room_id -> member count, for room pages that no longer load every member
+member_count_cache = LRUCache(max_size=4096, ttl=60)
 
 
 def _make_code(length: int = 8) -> str:
@@ -31,6 +44,8 @@ def create_room(owner_id: int, name: str, with_code: bool = True) -> Room:
     # owner auto member
     db.session.add(RoomMember(room_id=room.id, user_id=owner_id))
     db.session.commit()
+    membership_cache.set((room.id, owner_id), (True, True))
+    member_count_cache.set(room.id, 1)
 
     return room
 
@@ -41,32 +56,144 @@ def add_member(room: Room, user_id: int) -> None:
         db.session.commit()
     except IntegrityError:
         db.session.rollback()  # already member
+    membership_cache.pop((room.id, user_id))
+    member_count_cache.pop(room.id)
 
 
 def remove_member(room_id: int, user_id: int) -> None:
     RoomMember.query.filter_by(room_id=room_id, user_id=user_id).delete()
     db.session.commit()
+    membership_cache.pop((room_id, user_id))
+    member_count_cache.pop(room_id)
 
 
 def delete_room(room_id: int) -> None:
+    from .sessions_service import end_room_sessions
+
+    # A running timer would otherwise expire later and write focus_logs
+    # for a room that no longer exists.
+    end_room_sessions(room_id)
     # Cascade deletes members (FK ondelete="CASCADE") if configured.
     Room.query.filter_by(id=room_id).delete()
     db.session.commit()
+    timer_scheduler.cancel(room_id)
+    room_state_cache.publish(room_id)
+    member_count_cache.pop(room_id)
+    for key in membership_cache.keys():
+        if key[0] == room_id:
+            membership_cache.pop(key)
 
 
 def get_room(room_id: int) -> Optional[Room]:
     return Room.query.get(room_id)
 
 
-def get_user_rooms(user_id: int):
-    return (
-        db.session.query(Room)
-        .join(RoomMember, RoomMember.room_id == Room.id)
-        .filter(RoomMember.user_id == user_id)
-        .order_by(Room.created_at.desc())
-        .all()
+def get_room_for_member(room_id: int, user_id: int) -> Tuple[Optional[Room], bool]:
+    """Room plus "is this user a member" in one query; (None, False) if no room."""
+    row = (
+        db.session.query(Room, RoomMember.id)
+        .outerjoin(
+            RoomMember,
+            db.and_(RoomMember.room_id == Room.id, RoomMember.user_id == user_id),
+        )
+        .filter(Room.id == room_id)
+        .first()
+    )
+    if row is None:
+        return None, False
+
+    room, membership_id = row
+    is_member = membership_id is not None
+    membership_cache.set((room_id, user_id), (is_member, room.owner_id == user_id))
+    return room, is_member
+
+
+def get_membership(room_id: int, user_id: int) -> Optional[Tuple[bool, bool]]:
+    """
+    (is_member, is_owner) for a user in a room, None if the room does not exist.
+    One query on a cache miss, a dict lookup otherwise.
+    """
+    key = (room_id, user_id)
+    cached = membership_cache.get(key)
+    if cached is not MISSING:
+        return cached
+
+    row = (
+        db.session.query(Room.owner_id, RoomMember.id)
+        .outerjoin(
+            RoomMember,
+            db.and_(RoomMember.room_id == Room.id, RoomMember.user_id == user_id),
+        )
+        .filter(Room.id == room_id)
+        .first()
     )
 
+    result = None if row is None else (row[1] is not None, row[0] == user_id)
+    membership_cache.set(key, result)
+    return result
+
+
+def is_room_member(room_id: int, user_id: int) -> bool:
+    m = get_membership(room_id, user_id)
+    return bool(m and m[0])
+
+
+def is_room_owner(room_id: int, user_id: int) -> bool:
+    m = get_membership(room_id, user_id)
+    return bool(m and m[1])
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    """Keyset cursor for (timestamp, id) ordered pages."""
+    return f"{ts.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    try:
+        created_at, room_id = (cursor or "").rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(room_id)
+    except ValueError:
+        return None
+
+
+def get_user_rooms(user_id: int, limit: int = 24, before: Optional[Tuple[datetime, int]] = None):
+    """
+    One page of a user's rooms, newest first, keyset-paginated on
+    (created_at, id). Each row is (Room, member_count, latest_session_status)
+    and the whole page comes from a single query.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    member_count = (
+        db.select(db.func.count(RoomMember.id))
+        .where(RoomMember.room_id == Room.id)
+        .correlate(Room)
+        .scalar_subquery()
+    )
+    session_status = (
+        db.select(FocusSession.status)
+        .where(FocusSession.room_id == Room.id)
+        .order_by(FocusSession.created_at.desc())
+        .limit(1)
+        .correlate(Room)
+        .scalar_subquery()
+    )
+
+    q = (
+        db.session.query(Room, member_count, session_status)
+        .join(RoomMember, db.and_(RoomMember.room_id == Room.id, RoomMember.user_id == user_id))
+        .order_by(Room.created_at.desc(), Room.id.desc())
+    )
+    if before:
+        q = q.filter(db.tuple_(Room.created_at, Room.id) < before)
+
+    rows = q.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1][0]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return [(room, count, status or "idle") for room, count, status in rows[:limit]], next_cursor
+
 
 def find_room_by_code(code: str) -> Optional[Room]:
     c = (code or "").strip().upper()
@@ -75,19 +202,46 @@ def find_room_by_code(code: str) -> Optional[Room]:
     return Room.query.filter_by(join_code=c).first()
 
 
-def get_room_members(room: Room) -> List[Tuple[User, bool]]:
+def get_member_count(room_id: int) -> int:
+    cached = member_count_cache.get(room_id)
+    if cached is not MISSING:
+        return cached
+
+    count = (
+        db.session.query(db.func.count(RoomMember.id))
+        .filter(RoomMember.room_id == room_id)
+        .scalar()
+    )
+    member_count_cache.set(room_id, count)
+    return count
+
+
+def get_room_members(
+    room: Room,
+    limit: int = 50,
+    after: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[List[Tuple[int, str, bool]], Optional[str]]:
     """
-    Returns list of (User, is_owner) for a room.
+    One page of (user_id, username, is_owner) for a room, in join order.
+    Only the two columns we show are read, never full User rows.
+
+    Returns (members, next_cursor); next_cursor is None on the last page.
     """
-    rows = (
-        db.session.query(User, RoomMember)
+    q = (
+        db.session.query(User.id, User.username, RoomMember.joined_at, RoomMember.id)
         .join(RoomMember, RoomMember.user_id == User.id)
         .filter(RoomMember.room_id == room.id)
-        .order_by(RoomMember.joined_at.asc())
-        .all()
+        .order_by(RoomMember.joined_at.asc(), RoomMember.id.asc())
     )
+    if after:
+        q = q.filter(db.tuple_(RoomMember.joined_at, RoomMember.id) > after)
+
+    rows = q.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        _, _, joined_at, member_id = rows[limit - 1]
+        next_cursor = encode_cursor(joined_at, member_id)
 
-    members: List[Tuple[User, bool]] = []
-    for user, _membership in rows:
-        members.append((user, user.id == room.owner_id))
-    return members
\ No newline at end of file
+    members = [(uid, uname, uid == room.owner_id) for uid, uname, _, _ in rows[:limit]]
+    return members, next_cursor
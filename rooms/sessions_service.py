@@ -1,9 +1,16 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import List, Optional
 
+from main.cache import MISSING
 from main.db import db
 from models.focus import FocusSession, FocusLog
+from stats.service import record_focus
+from .models import Room
+from .presence import get_presence
+from .scheduler import timer_scheduler
+from .state_cache import room_state_cache, SessionSnapshot
 
 
 def get_active_session(room_id: int) -> FocusSession | None:
@@ -11,7 +18,7 @@ def get_active_session(room_id: int) -> FocusSession | None:
         FocusSession.query
         .filter(
             FocusSession.room_id == room_id,
-            FocusSession.status.in_(["running", "paused"])  # ΟΧΙ ended
+            FocusSession.active_status_clause()  # ΟΧΙ ended
         )
         .order_by(FocusSession.created_at.desc())
         .first()
@@ -27,10 +34,70 @@ def get_latest_session(room_id: int) -> FocusSession | None:
     )
 
 
-def start_session(room_id: int, user_id: int, duration_seconds: int) -> FocusSession:
+def get_room_state(room_id: int) -> SessionSnapshot | None:
+    """
+    Latest session of the room as a cached snapshot.
+    Only touches the DB on a cache miss.
+    """
+    snap = room_state_cache.get(room_id)
+    if snap is not MISSING:
+        return snap
+
+    generation = room_state_cache.generation(room_id)
+    s = get_latest_session(room_id)
+    snap = SessionSnapshot.from_session(s) if s else None
+    room_state_cache.fill(room_id, snap, generation)
+    return snap
+
+
+def _publish(snap: SessionSnapshot) -> None:
+    room_state_cache.publish(snap.room_id, snap)
+    timer_scheduler.track(snap)
+
+
+# Every control below is one transaction: lock the room row, read the
+# active session, change it, commit. The lock serializes controls of the
+# same room across workers (two concurrent starts cannot both see "no
+# active session"); on SQLite FOR UPDATE is a no-op and the database's
+# single writer does the same job. The caller gets the new state back as
+# a snapshot taken before the commit, so nothing is reloaded afterwards.
+
+def _lock_room(room_id: int) -> bool:
+    """False when the room has been deleted."""
+    row = db.session.execute(db.select(Room.id).where(Room.id == room_id).with_for_update())
+    return row.scalar() is not None
+
+
+def _participants(room_id: int, user_id: int) -> List[int]:
+    # Credit everyone who is actually in the room; fall back to whoever
+    # ended it when presence is empty (e.g. expired with nobody online).
+    # Read before taking the lock: no network I/O while holding it.
+    return sorted(get_presence().members(room_id)) or [user_id]
+
+
+def _commit(s: FocusSession) -> SessionSnapshot:
+    db.session.flush()
+    snap = SessionSnapshot.from_session(s)
+    db.session.commit()
+    _publish(snap)
+    return snap
+
+
+def _unchanged(s: Optional[FocusSession]) -> Optional[SessionSnapshot]:
+    snap = SessionSnapshot.from_session(s) if s else None
+    db.session.rollback()  # releases the lock
+    return snap
+
+
+def start_session(room_id: int, user_id: int, duration_seconds: int) -> Optional[SessionSnapshot]:
+    """None when the room was deleted meanwhile."""
+    participants = _participants(room_id, user_id)
+    if not _lock_room(room_id):
+        return _unchanged(None)
+
     active = get_active_session(room_id)
     if active:
-        end_session(active, user_id)
+        _end(active, participants)
 
     s = FocusSession(
         room_id=room_id,
@@ -43,69 +110,127 @@ def start_session(room_id: int, user_id: int, duration_seconds: int) -> FocusSes
         ended_at=None,
     )
     db.session.add(s)
-    db.session.commit()
-    return s
+    return _commit(s)
 
 
-def pause_session(s: FocusSession) -> FocusSession:
-    if s.status != "running":
-        return s
+def pause_session(room_id: int) -> Optional[SessionSnapshot]:
+    """None when the room has no active session."""
+    _lock_room(room_id)
+    s = get_active_session(room_id)
+    if not s or s.status != "running":
+        return _unchanged(s)
 
     s.status = "paused"
     s.paused_at = datetime.utcnow()
-    db.session.commit()
-    return s
+    return _commit(s)
 
 
-def resume_session(s: FocusSession) -> FocusSession:
-    if s.status != "paused":
-        return s
+def resume_session(room_id: int) -> Optional[SessionSnapshot]:
+    _lock_room(room_id)
+    s = get_active_session(room_id)
+    if not s or s.status != "paused":
+        return _unchanged(s)
 
     if s.paused_at:
         s.paused_seconds += int((datetime.utcnow() - s.paused_at).total_seconds())
 
     s.paused_at = None
     s.status = "running"
-    db.session.commit()
-    return s
+    return _commit(s)
 
 
-def reset_session(s: FocusSession, user_id: int) -> FocusSession:
+def reset_session(room_id: int, user_id: int) -> Optional[SessionSnapshot]:
+    _lock_room(room_id)
+    s = get_active_session(room_id)
+    if not s:
+        return _unchanged(s)
+
     s.status = "idle"
     s.started_by = user_id
     s.started_at = None
     s.ended_at = None
     s.paused_at = None
     s.paused_seconds = 0
-    db.session.commit()
-    return s
-
+    return _commit(s)
+
+
+def end_session(room_id: int, user_id: int) -> Optional[SessionSnapshot]:
+    participants = _participants(room_id, user_id)
+    _lock_room(room_id)
+    s = get_active_session(room_id)
+    if not s:
+        return _unchanged(s)
+
+    _end(s, participants)
+    return _commit(s)
+
+
+def expire_session(session_id: int) -> Optional[SessionSnapshot]:
+    """
+    Timer scheduler: end a running session whose time is up. None when it
+    was paused/ended meanwhile or still has time left (then re-tracked).
+    """
+    s = db.session.get(FocusSession, session_id)
+    if not s or s.status != "running":
+        return None
+
+    participants = _participants(s.room_id, s.started_by)
+    if not _lock_room(s.room_id):
+        # room deleted under a running timer: nobody to credit (focus_logs
+        # reference the room), just stop tracking it
+        return _unchanged(None)
+    db.session.refresh(s)
+    if s.status != "running" or s.remaining_seconds() > 0:
+        if s.status == "running":
+            timer_scheduler.track(s)
+        db.session.rollback()
+        return None
+
+    _end(s, participants)
+    return _commit(s)
+
+
+def end_room_sessions(room_id: int) -> None:
+    """
+    Before deleting a room: end its active session without crediting
+    anyone (the room's focus_logs go with it). The caller commits.
+    """
+    _lock_room(room_id)
+    db.session.execute(
+        db.update(FocusSession)
+        .where(FocusSession.room_id == room_id, FocusSession.active_status_clause())
+        .values(status="ended", ended_at=datetime.utcnow(), paused_at=None)
+        .execution_options(synchronize_session=False)
+    )
 
-def end_session(s: FocusSession, user_id: int) -> FocusSession:
-    if s.status == "ended":
-        return s
 
+def _end(s: FocusSession, participants: List[int]) -> None:
+    """Mark `s` ended and credit `participants`; the caller commits."""
     remaining = s.remaining_seconds()
     focused = max(0, s.duration_seconds - remaining)
 
+    now = datetime.utcnow()
     s.status = "ended"
-    s.ended_at = datetime.utcnow()
+    s.ended_at = now
 
     # 🔴 ΚΡΙΣΙΜΟ FIX:
     # Αν ήταν paused, αφαιρούμε paused time
     if s.paused_at:
-        s.paused_seconds += int((datetime.utcnow() - s.paused_at).total_seconds())
+        s.paused_seconds += int((now - s.paused_at).total_seconds())
         s.paused_at = None
 
-    db.session.commit()
-
-    log = FocusLog(
-        user_id=user_id,
-        room_id=s.room_id,
-        session_id=s.id,
-        focused_seconds=focused,
-    )
-    db.session.add(log)
-    db.session.commit()
-
-    return s
\ No newline at end of file
+    logs = [
+        {
+            "user_id": uid,
+            "room_id": s.room_id,
+            "session_id": s.id,
+            "focused_seconds": focused,
+            "created_at": now,
+        }
+        for uid in participants
+    ]
+
+    # session, logs and rollups go in one transaction; the logs are one
+    # bulk INSERT however many people were in the room
+    db.session.execute(db.insert(FocusLog), logs)
+    record_focus(logs, now.date())
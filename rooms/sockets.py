@@ -1,16 +1,20 @@
 from __future__ import annotations
 
-from datetime import datetime
 from typing import Dict, Set
 
-from flask import session
+from flask import current_app, request, session
 from flask_socketio import join_room, leave_room, emit
 
+from auth.service import remember_username
+from main.instrumentation import observe_event
+from main.metrics import observe_broadcast
+from main.tracing import span
 from main.socketio_ext import socketio
-from .models import RoomMember
-from .service import get_room
+from .presence import get_presence
+from .scheduler import timer_scheduler
+from .service import is_room_member, is_room_owner
 from .sessions_service import (
-    get_active_session,
+    get_room_state,
     start_session,
     pause_session,
     resume_session,
@@ -18,34 +22,83 @@ from .sessions_service import (
     end_session,
 )
 
-PRESENCE: Dict[int, Set[int]] = {}
-
 
 def _room_key(room_id: int) -> str:
     return f"room:{room_id}"
 
 
-def _broadcast_presence(room_id: int) -> None:
-    users = sorted(list(PRESENCE.get(room_id, set())))
-    emit(
-        "presence:update",
-        {"room_id": room_id, "count": len(users), "users": users},
-        room=_room_key(room_id),
-    )
+def _broadcast(event: str, payload: dict, room_id: int) -> None:
+    room = _room_key(room_id)
+    with span("emit", f"{event} -> {room}"):
+        socketio.emit(event, payload, to=room)
+    observe_broadcast(event, room)
+
+
+# room_id -> {"join": user ids, "leave": user ids} waiting for the next flush
+_PENDING_PRESENCE: Dict[int, Dict[str, Set[int]]] = {}
+
+
+def _presence_snapshot(room_id: int):
+    users = sorted(get_presence().members(room_id))
+    return {"room_id": room_id, "count": len(users), "users": users}
+
+
+def _queue_presence(room_id: int, user_id: int, joined: bool) -> None:
+    """
+    Buffer a presence change; bursts within PRESENCE_COALESCE_MS go out as
+    one presence:join / presence:leave delta per room.
+    """
+    pending = _PENDING_PRESENCE.get(room_id)
+    if pending is None:
+        pending = _PENDING_PRESENCE[room_id] = {"join": set(), "leave": set()}
+        window = current_app.config["PRESENCE_COALESCE_MS"] / 1000.0
+        socketio.start_background_task(_flush_presence, room_id, window)
+
+    # a join and a leave of the same user inside one window cancel out
+    add, undo = ("join", "leave") if joined else ("leave", "join")
+    if user_id in pending[undo]:
+        pending[undo].discard(user_id)
+    else:
+        pending[add].add(user_id)
+
+
+def _flush_presence(room_id: int, window: float) -> None:
+    socketio.sleep(window)
+    pending = _PENDING_PRESENCE.pop(room_id, None)
+    if not pending or not (pending["join"] or pending["leave"]):
+        return
+
+    # The local join/leave only says this worker's last tab came or went;
+    # the shared set decides. A user still present via another worker has
+    # not left, and one who already left again has not joined.
+    members = get_presence().members(room_id)
+    changes = {
+        "join": pending["join"] & members,
+        "leave": pending["leave"] - members,
+    }
+    for kind in ("join", "leave"):
+        if changes[kind]:
+            _broadcast(
+                f"presence:{kind}",
+                {"room_id": room_id, "count": len(members), "users": sorted(changes[kind])},
+                room_id,
+            )
 
 
 def _is_member(room_id: int, user_id: int) -> bool:
-    return RoomMember.query.filter_by(room_id=room_id, user_id=user_id).first() is not None
+    return is_room_member(room_id, user_id)
 
 
 def _is_owner(room_id: int, user_id: int) -> bool:
-    room = get_room(room_id)
-    return bool(room and room.owner_id == user_id)
+    return is_room_owner(room_id, user_id)
 
 
 def _session_payload(room_id: int):
-    s = get_active_session(room_id)
-    if not s:
+    return _state_payload(get_room_state(room_id))
+
+
+def _state_payload(s):
+    if not s or not s.is_active:
         return {"status": "idle", "remaining_seconds": 25 * 60}
     return {
         "status": s.status,
@@ -55,7 +108,24 @@ def _session_payload(room_id: int):
     }
 
 
+@timer_scheduler.expired_handler
+def _on_timer_expired(s) -> None:
+    _broadcast("timer:expired", {"room_id": s.room_id, "session_id": s.id}, s.room_id)
+    _broadcast(
+        "timer:update",
+        {
+            "room_id": s.room_id,
+            "status": s.status,
+            "remaining_seconds": 0,
+            "duration_seconds": s.duration_seconds,
+            "started_by": s.started_by,
+        },
+        s.room_id,
+    )
+
+
 @socketio.on("room:join")
+@observe_event("room:join")
 def on_room_join(data):
     room_id = int(data.get("room_id") or 0)
     user_id = session.get("user_id")
@@ -70,14 +140,22 @@ def on_room_join(data):
 
     join_room(_room_key(room_id))
 
-    PRESENCE.setdefault(room_id, set()).add(int(user_id))
-    _broadcast_presence(room_id)
+    # the presence endpoint resolves names from this cache
+    if session.get("username"):
+        remember_username(int(user_id), session["username"])
+
+    if get_presence().join(request.sid, room_id, int(user_id)):
+        _queue_presence(room_id, int(user_id), joined=True)
+
+    # Full snapshot only for the joining socket; everyone else gets deltas
+    emit("presence:update", _presence_snapshot(room_id))
 
     # Send current session state to the joining user
     emit("timer:update", {"room_id": room_id, **_session_payload(room_id)})
 
 
 @socketio.on("room:leave")
+@observe_event("room:leave")
 def on_room_leave(data):
     room_id = int(data.get("room_id") or 0)
     user_id = session.get("user_id")
@@ -86,29 +164,16 @@ def on_room_leave(data):
 
     leave_room(_room_key(room_id))
 
-    if room_id in PRESENCE and int(user_id) in PRESENCE[room_id]:
-        PRESENCE[room_id].remove(int(user_id))
-        if not PRESENCE[room_id]:
-            PRESENCE.pop(room_id, None)
-    _broadcast_presence(room_id)
+    if get_presence().leave(request.sid, room_id):
+        _queue_presence(room_id, int(user_id), joined=False)
 
 
 @socketio.on("disconnect")
+@observe_event("disconnect")
 def on_disconnect():
     user_id = session.get("user_id")
-    if not user_id:
-        return
-
-    uid = int(user_id)
-    empty_rooms = []
-    for rid, users in PRESENCE.items():
-        if uid in users:
-            users.remove(uid)
-            _broadcast_presence(rid)
-        if not users:
-            empty_rooms.append(rid)
-    for rid in empty_rooms:
-        PRESENCE.pop(rid, None)
+    for rid in get_presence().disconnect(request.sid):
+        _queue_presence(rid, int(user_id), joined=False)
 
 
 def _require_owner(room_id: int, user_id: int) -> bool:
@@ -119,6 +184,7 @@ def _require_owner(room_id: int, user_id: int) -> bool:
 
 
 @socketio.on("timer:start")
+@observe_event("timer:start")
 def on_timer_start(data):
     room_id = int(data.get("room_id") or 0)
     minutes = int(data.get("minutes") or 25)
@@ -136,12 +202,13 @@ def on_timer_start(data):
         return
 
     minutes = max(1, min(minutes, 180))
-    start_session(room_id, int(user_id), minutes * 60)
+    snap = start_session(room_id, int(user_id), minutes * 60)
 
-    emit("timer:update", {"room_id": room_id, **_session_payload(room_id)}, room=_room_key(room_id))
+    _broadcast("timer:update", {"room_id": room_id, **_state_payload(snap)}, room_id)
 
 
 @socketio.on("timer:pause")
+@observe_event("timer:pause")
 def on_timer_pause(data):
     room_id = int(data.get("room_id") or 0)
     user_id = session.get("user_id")
@@ -150,14 +217,12 @@ def on_timer_pause(data):
     if not _require_owner(room_id, int(user_id)):
         return
 
-    s = get_active_session(room_id)
-    if s:
-        pause_session(s)
-
-    emit("timer:update", {"room_id": room_id, **_session_payload(room_id)}, room=_room_key(room_id))
+    snap = pause_session(room_id)
+    _broadcast("timer:update", {"room_id": room_id, **_state_payload(snap)}, room_id)
 
 
 @socketio.on("timer:resume")
+@observe_event("timer:resume")
 def on_timer_resume(data):
     room_id = int(data.get("room_id") or 0)
     user_id = session.get("user_id")
@@ -166,14 +231,12 @@ def on_timer_resume(data):
     if not _require_owner(room_id, int(user_id)):
         return
 
-    s = get_active_session(room_id)
-    if s:
-        resume_session(s)
-
-    emit("timer:update", {"room_id": room_id, **_session_payload(room_id)}, room=_room_key(room_id))
+    snap = resume_session(room_id)
+    _broadcast("timer:update", {"room_id": room_id, **_state_payload(snap)}, room_id)
 
 
 @socketio.on("timer:reset")
+@observe_event("timer:reset")
 def on_timer_reset(data):
     room_id = int(data.get("room_id") or 0)
     user_id = session.get("user_id")
@@ -182,14 +245,12 @@ def on_timer_reset(data):
     if not _require_owner(room_id, int(user_id)):
         return
 
-    s = get_active_session(room_id) or None
-    if s:
-        reset_session(s, int(user_id))
-
-    emit("timer:update", {"room_id": room_id, **_session_payload(room_id)}, room=_room_key(room_id))
+    snap = reset_session(room_id, int(user_id))
+    _broadcast("timer:update", {"room_id": room_id, **_state_payload(snap)}, room_id)
 
 
 @socketio.on("timer:end")
+@observe_event("timer:end")
 def on_timer_end(data):
     room_id = int(data.get("room_id") or 0)
     user_id = session.get("user_id")
@@ -198,8 +259,5 @@ def on_timer_end(data):
     if not _require_owner(room_id, int(user_id)):
         return
 
-    s = get_active_session(room_id)
-    if s:
-        end_session(s, int(user_id))
-
-    emit("timer:update", {"room_id": room_id, **_session_payload(room_id)}, room=_room_key(room_id))
\ No newline at end of file
+    snap = end_session(room_id, int(user_id))
+    _broadcast("timer:update", {"room_id": room_id, **_state_payload(snap)}, room_id)
\ No newline at end of file
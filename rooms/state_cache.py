@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+import zlib
+from datetime import datetime
+from typing import Dict, Optional
+
+from gevent.event import Event
+
+try:
+    import redis
+except ImportError:  # optional, only needed with more than one worker
+    redis = None
+
+logger = logging.getLogger("focusbuddy.state_cache")
+
+from main.cache import LRUCache, MISSING
+from models.focus import ACTIVE_STATUSES, FocusSession, compute_remaining_seconds
+
+
+class SessionSnapshot:
+    """Detached, read-only copy of the latest FocusSession of a room."""
+
+    __slots__ = (
+        "id",
+        "room_id",
+        "started_by",
+        "status",
+        "duration_seconds",
+        "started_at",
+        "paused_at",
+        "paused_seconds",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        room_id: int,
+        started_by: int,
+        status: str,
+        duration_seconds: int,
+        started_at: Optional[datetime],
+        paused_at: Optional[datetime],
+        paused_seconds: int,
+    ):
+        self.id = id
+        self.room_id = room_id
+        self.started_by = started_by
+        self.status = status
+        self.duration_seconds = duration_seconds
+        self.started_at = started_at
+        self.paused_at = paused_at
+        self.paused_seconds = paused_seconds
+
+    @classmethod
+    def from_session(cls, s: FocusSession) -> "SessionSnapshot":
+        return cls(
+            id=s.id,
+            room_id=s.room_id,
+            started_by=s.started_by,
+            status=s.status,
+            duration_seconds=s.duration_seconds,
+            started_at=s.started_at,
+            paused_at=s.paused_at,
+            paused_seconds=s.paused_seconds or 0,
+        )
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def remaining_seconds(self) -> int:
+        return compute_remaining_seconds(
+            self.status,
+            self.duration_seconds,
+            self.started_at,
+            self.paused_at,
+            self.paused_seconds,
+        )
+
+    @property
+    def version(self) -> str:
+        """
+        Changes only when the owner changes the timer, not every second.
+        Derived from the row itself so every worker computes the same value.
+        """
+        raw = repr((
+            self.id,
+            self.status,
+            self.duration_seconds,
+            self.started_at,
+            self.paused_at,
+            self.paused_seconds,
+        ))
+        return f"s{self.id}-{zlib.crc32(raw.encode()):08x}"
+
+
+def state_version(snapshot: Optional[SessionSnapshot]) -> str:
+    return snapshot.version if snapshot else "none"
+
+
+class RoomStateCache:
+    """
+    room_id -> SessionSnapshot of the room's latest session (or None when
+    the room never had one).
+
+    Kept write-through by rooms.sessions_service, so in a single worker the
+    cached value is always the committed state. With several workers every
+    change is also published on a Redis channel (ROOM_STATE_BUS_URL) and
+    the other workers drop their copy. Idle rooms fall out via LRU.
+    """
+
+    CHANNEL = "focusbuddy:room-state"
+
+    def __init__(self, max_size: int = 4096, ttl: Optional[float] = None):
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+        # long-poll waiters, one event per room with someone waiting
+        self._changed: Dict[int, Event] = {}
+        # room_id -> sequence number of its last change, so a miss fill
+        # that raced a change can be dropped (see generation()); anything
+        # older than _floor counts as changed
+        self._seq = 0
+        self._floor = 0
+        self._generations: Dict[int, int] = {}
+        self._bus = None
+        self._origin = uuid.uuid4().hex
+        self._listening = False
+
+    def init_app(self, app, client=None) -> None:
+        """No I/O here; the subscriber starts with start_listener()."""
+        self._cache.configure(
+            max_size=app.config.get("ROOM_STATE_CACHE_SIZE"),
+            ttl=app.config.get("ROOM_STATE_CACHE_TTL"),
+        )
+        url = app.config.get("ROOM_STATE_BUS_URL")
+        queue = app.config.get("SOCKETIO_MESSAGE_QUEUE") or ""
+        if not url and queue.startswith(("redis://", "rediss://")):
+            url = queue
+        if client is None and url:
+            if redis is None:
+                raise RuntimeError("ROOM_STATE_BUS_URL requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self._bus = client
+        app.extensions["room_state_cache"] = self
+
+    def get(self, room_id: int):
+        """Returns a snapshot, None (room has no session) or MISSING."""
+        return self._cache.get(room_id)
+
+    def generation(self, room_id: int) -> int:
+        """Take before the DB read of a cache miss and hand it to fill()."""
+        return max(self._generations.get(room_id, 0), self._floor)
+
+    def fill(self, room_id: int, snapshot: Optional[SessionSnapshot], generation: int) -> None:
+        """
+        Store what a cache miss read from the DB, unless the room changed
+        while it was reading: that snapshot may be older than the one the
+        change published (a pause keeps the session id, so put() cannot
+        tell).
+        """
+        if self.generation(room_id) == generation:
+            self.put(room_id, snapshot)
+
+    def _changed_now(self, room_id: int) -> None:
+        self._seq += 1
+        if len(self._generations) >= self._cache.max_size:
+            # only in-flight fills care; make them all retry instead
+            self._forget_generations()
+        self._generations[room_id] = self._seq
+
+    def _forget_generations(self) -> None:
+        self._seq += 1
+        self._floor = self._seq
+        self._generations.clear()
+
+    def put(self, room_id: int, snapshot: Optional[SessionSnapshot]) -> None:
+        current = self._cache.peek(room_id)
+        # never let an older session overwrite a newer one
+        if snapshot and current not in (MISSING, None) and current.id > snapshot.id:
+            return
+        self._cache.set(room_id, snapshot)
+
+    def publish(self, room_id: int, snapshot=MISSING) -> None:
+        """
+        After a commit: store the new snapshot (or just drop the entry
+        when none is given), wake the room's long-poll waiters and tell
+        the other workers to drop their copy.
+        """
+        if snapshot is MISSING:
+            self.invalidate(room_id)
+        else:
+            self._changed_now(room_id)
+            self.put(room_id, snapshot)
+            self._notify(room_id)
+        if self._bus is None:
+            return
+        try:
+            self._bus.publish(self.CHANNEL, f"{self._origin}:{room_id}")
+        except Exception:  # noqa: BLE001  (the TTL is the backstop)
+            logger.warning("room state bus: publish for room %s failed", room_id, exc_info=True)
+
+    def start_listener(self, app) -> None:
+        """Per worker, after any fork."""
+        if self._bus is None or self._listening:
+            return
+        self._listening = True
+
+        from main.socketio_ext import socketio
+
+        socketio.start_background_task(self._listen)
+
+    def _listen(self) -> None:
+        while True:
+            pubsub = self._bus.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.CHANNEL)
+                # changes published while we were not subscribed are lost;
+                # long-polls re-read instead of sleeping on stale state
+                self.clear()
+                for room_id in list(self._changed):
+                    self._notify(room_id)
+                for message in pubsub.listen():
+                    self._on_message(message["data"])
+            except Exception:  # noqa: BLE001
+                logger.exception("room state bus: subscriber failed, resubscribing")
+            finally:
+                pubsub.close()
+            time.sleep(1)
+
+    def _on_message(self, data) -> None:
+        if isinstance(data, bytes):
+            data = data.decode()
+        origin, _, room_id = data.partition(":")
+        if origin != self._origin:
+            # also wakes this worker's long-poll waiters for the room
+            self.invalidate(int(room_id))
+
+    def invalidate(self, room_id: int) -> None:
+        self._changed_now(room_id)
+        self._cache.pop(room_id)
+        self._notify(room_id)
+
+    def watch(self, room_id: int) -> Event:
+        """
+        Event set on the room's next change. Take it *before* reading the
+        state to wait on, so a change landing in between is not missed.
+        """
+        ev = self._changed.get(room_id)
+        if ev is None:
+            ev = self._changed[room_id] = Event()
+        return ev
+
+    def _notify(self, room_id: int) -> None:
+        ev = self._changed.pop(room_id, None)
+        if ev is not None:
+            ev.set()
+
+    def clear(self) -> None:
+        self._forget_generations()
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+room_state_cache = RoomStateCache()
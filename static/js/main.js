@@ -23,24 +23,44 @@ async function copyInviteLink() {
   }
 }
 
+let fsState = null;
+let fsReceivedAt = 0;
+let fsEtag = null;
+
+function renderSession() {
+  if (!fsState) return;
+  const statusEl = document.getElementById("fs-status");
+  const timerEl = document.getElementById("fs-timer");
+
+  let remaining = fsState.remaining_seconds ?? 1500;
+  if (fsState.status === "running") {
+    remaining = Math.max(0, remaining - Math.floor((Date.now() - fsReceivedAt) / 1000));
+  }
+
+  if (statusEl) statusEl.textContent = fsState.status || "idle";
+  if (timerEl) timerEl.textContent = fmt(remaining);
+}
+
 async function pollSession(sessionUrl) {
   try {
-    const res = await fetch(sessionUrl, { cache: "no-store" });
-    if (!res.ok) return;
-    const data = await res.json();
+    const headers = {};
+    if (fsEtag) headers["If-None-Match"] = fsEtag;
 
-    const statusEl = document.getElementById("fs-status");
-    const timerEl = document.getElementById("fs-timer");
+    const res = await fetch(sessionUrl, { cache: "no-store", headers });
+    if (res.status === 304 || !res.ok) return;
 
-    if (statusEl) statusEl.textContent = data.status || "idle";
-    if (timerEl) timerEl.textContent = fmt(data.remaining_seconds ?? 1500);
+    fsEtag = res.headers.get("ETag");
+    fsState = await res.json();
+    fsReceivedAt = Date.now();
+    renderSession();
   } catch (_) {
   }
 }
 
 async function pollPresence(presenceUrl) {
   try {
-    const res = await fetch(presenceUrl, { cache: "no-store" });
+    const url = presenceUrl + (presenceUrl.includes("?") ? "&" : "?") + "count_only=1";
+    const res = await fetch(url, { cache: "no-store" });
     if (!res.ok) return;
     const data = await res.json();
 
@@ -93,6 +113,7 @@ window.addEventListener("DOMContentLoaded", () => {
     if (sessionUrl) {
       pollSession(sessionUrl);
       setInterval(() => pollSession(sessionUrl), 1000);
+      setInterval(renderSession, 1000);
     }
     if (presenceUrl) {
       pollPresence(presenceUrl);
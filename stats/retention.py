@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+
+from main.db import db
+from models.focus import FocusLog, FocusLogArchive, FocusSession, FocusSessionArchive
+
+logger = logging.getLogger("focusbuddy.retention")
+
+# sessions that can never change again
+FINISHED_STATUSES = ("ended", "idle")
+
+_SESSION_COLUMNS = (
+    "id", "room_id", "started_by", "status", "duration_seconds", "started_at",
+    "ended_at", "paused_at", "paused_seconds", "created_at",
+)
+_LOG_COLUMNS = ("id", "user_id", "room_id", "session_id", "focused_seconds", "created_at")
+
+
+class ArchiveResult:
+    __slots__ = ("sessions", "logs", "batches", "stopped")
+
+    def __init__(self):
+        self.sessions = 0
+        self.logs = 0
+        self.batches = 0
+        self.stopped: Optional[str] = None
+
+
+def parse_hours(spec: str) -> Optional[Tuple[int, int]]:
+    """
+    "8-23" -> (8, 23): from 08:00 up to (not including) 23:00, UTC.
+    Raises ValueError unless both ends are hours 0-23.
+
+    >>> parse_hours("8-23"), parse_hours("18-2"), parse_hours("")
+    ((8, 23), (18, 2), None)
+    >>> parse_hours("25-3")
+    Traceback (most recent call last):
+    ...
+    ValueError: peak hours must be "<start>-<end>" with hours 0-23, got '25-3'
+    >>> parse_hours("9-x")
+    Traceback (most recent call last):
+    ...
+    ValueError: peak hours must be "<start>-<end>" with hours 0-23, got '9-x'
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    parts = spec.split("-")
+    if len(parts) != 2 or not all(p.strip().isdigit() and int(p) <= 23 for p in parts):
+        raise ValueError(f'peak hours must be "<start>-<end>" with hours 0-23, got {spec!r}')
+    start, end = (int(p) for p in parts)
+    return start, end
+
+
+def in_peak_hours(window: Optional[Tuple[int, int]], now: Optional[datetime] = None) -> bool:
+    if window is None:
+        return False
+    hour = (now or datetime.utcnow()).hour
+    start, end = window
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end  # wraps midnight, e.g. "18-2"
+
+
+def _begin_batch(lock_timeout_ms: int) -> None:
+    # Postgres: give up on a row lock instead of queueing behind the app
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(db.text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+        db.session.execute(db.text(f"SET LOCAL statement_timeout = {int(lock_timeout_ms) * 10}"))
+
+
+def _select_batch(cutoff: datetime, batch_size: int) -> List[int]:
+    q = (
+        db.select(FocusSession.id)
+        .where(FocusSession.status.in_(FINISHED_STATUSES), FocusSession.created_at < cutoff)
+        .order_by(FocusSession.id)
+        .limit(batch_size)
+    )
+    if db.session.get_bind().dialect.name == "postgresql":
+        q = q.with_for_update(skip_locked=True)
+    return db.session.execute(q).scalars().all()
+
+
+def archive_batch(cutoff: datetime, batch_size: int, lock_timeout_ms: int) -> Tuple[int, int]:
+    """
+    Move up to `batch_size` finished sessions created before `cutoff`, with
+    their focus_logs, to the archive tables in one short transaction.
+    Returns (sessions, logs) moved.
+    """
+    _begin_batch(lock_timeout_ms)
+    ids = _select_batch(cutoff, batch_size)
+    if not ids:
+        db.session.rollback()
+        return 0, 0
+
+    now = datetime.utcnow()
+    log_cols = [getattr(FocusLog, c) for c in _LOG_COLUMNS]
+    db.session.execute(
+        db.insert(FocusLogArchive).from_select(
+            list(_LOG_COLUMNS) + ["archived_at"],
+            db.select(*log_cols, db.literal(now)).where(FocusLog.session_id.in_(ids)),
+        )
+    )
+    logs = db.session.execute(db.delete(FocusLog).where(FocusLog.session_id.in_(ids))).rowcount
+
+    session_cols = [getattr(FocusSession, c) for c in _SESSION_COLUMNS]
+    db.session.execute(
+        db.insert(FocusSessionArchive).from_select(
+            list(_SESSION_COLUMNS) + ["archived_at"],
+            db.select(*session_cols, db.literal(now)).where(FocusSession.id.in_(ids)),
+        )
+    )
+    db.session.execute(db.delete(FocusSession).where(FocusSession.id.in_(ids)))
+    db.session.commit()
+    return len(ids), logs
+
+
+def archive_old_sessions(
+    days: int,
+    batch_size: int = 1000,
+    pause: float = 0.5,
+    max_batches: Optional[int] = None,
+    peak_hours: Optional[Tuple[int, int]] = None,
+    lock_timeout_ms: int = 2000,
+    force: bool = False,
+    retries: int = 3,
+) -> ArchiveResult:
+    """
+    Archive finished sessions (and their logs) older than `days`, batch by
+    batch, sleeping `pause` seconds in between so the app gets the tables
+    back. Stops as soon as peak hours begin unless `force`.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = ArchiveResult()
+    failures = 0
+
+    while max_batches is None or result.batches < max_batches:
+        if not force and in_peak_hours(peak_hours):
+            result.stopped = "peak hours"
+            break
+        try:
+            sessions, logs = archive_batch(cutoff, batch_size, lock_timeout_ms)
+        except OperationalError as exc:
+            # lock/statement timeout: someone is using these rows, back off
+            db.session.rollback()
+            failures += 1
+            logger.warning("retention batch failed (%s/%s): %s", failures, retries, exc.orig)
+            if failures >= retries:
+                result.stopped = "lock timeouts"
+                break
+            time.sleep(pause * 2 ** failures)
+            continue
+
+        failures = 0
+        if not sessions:
+            break
+        result.sessions += sessions
+        result.logs += logs
+        result.batches += 1
+        logger.info("archived %s sessions, %s logs", sessions, logs)
+        time.sleep(pause)
+
+    return result
+
+
+def count_archivable(days: int) -> Tuple[int, int]:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    ids = (
+        db.select(FocusSession.id)
+        .where(FocusSession.status.in_(FINISHED_STATUSES), FocusSession.created_at < cutoff)
+    )
+    sessions = db.session.execute(db.select(db.func.count()).select_from(ids.subquery())).scalar()
+    logs = db.session.execute(
+        db.select(db.func.count(FocusLog.id)).where(FocusLog.session_id.in_(ids))
+    ).scalar()
+    return sessions, logs
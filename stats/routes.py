@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import click
+from flask import current_app, jsonify, request, session
+
+from main.auth_utils import login_required
+from rooms.service import get_membership
+
+from . import stats_bp
+from .retention import archive_old_sessions, count_archivable, parse_hours
+from .service import get_user_history, get_room_leaderboard, backfill_rollups
+
+
+def _days_arg(default: int) -> int:
+    try:
+        days = int(request.args.get("days") or default)
+    except ValueError:
+        days = default
+    return max(1, min(days, 366))
+
+
+@stats_bp.get("/stats/history")
+@login_required
+def stats_history():
+    days = _days_arg(30)
+    return jsonify({"days": days, "history": get_user_history(session["user_id"], days)})
+
+
+@stats_bp.get("/stats/rooms/<int:room_id>/leaderboard")
+@login_required
+def stats_room_leaderboard(room_id: int):
+    membership = get_membership(room_id, session["user_id"])
+    if membership is None:
+        return jsonify({"error": "Room not found"}), 404
+
+    if not membership[0]:
+        return jsonify({"error": "Forbidden"}), 403
+
+    days = _days_arg(7)
+    return jsonify({
+        "room_id": room_id,
+        "days": days,
+        "leaderboard": get_room_leaderboard(room_id, days),
+    })
+
+
+@stats_bp.cli.command("backfill")
+def stats_backfill():
+    """Rebuild the daily focus rollups from focus_logs."""
+    users, room_users = backfill_rollups()
+    click.echo(f"user_daily_focus: {users} rows, room_user_daily_focus: {room_users} rows")
+
+
+@stats_bp.cli.command("archive")
+@click.option("--days", type=int, help="Age cutoff (default RETENTION_DAYS).")
+@click.option("--batch-size", type=int, help="Sessions per transaction (default RETENTION_BATCH_SIZE).")
+@click.option("--max-batches", type=int, help="Stop after this many batches.")
+@click.option("--dry-run", is_flag=True, help="Only count what would be archived.")
+@click.option("--force", is_flag=True, help="Run even inside RETENTION_PEAK_HOURS.")
+def stats_archive(days, batch_size, max_batches, dry_run, force):
+    """Move old finished sessions and their focus_logs to the archive tables."""
+    cfg = current_app.config
+    days = days or cfg["RETENTION_DAYS"]
+    try:
+        peak_hours = parse_hours(cfg["RETENTION_PEAK_HOURS"])
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="RETENTION_PEAK_HOURS") from e
+
+    if dry_run:
+        sessions, logs = count_archivable(days)
+        click.echo(f"would archive {sessions} sessions, {logs} focus_logs older than {days} days")
+        return
+
+    result = archive_old_sessions(
+        days,
+        batch_size=batch_size or cfg["RETENTION_BATCH_SIZE"],
+        pause=cfg["RETENTION_BATCH_PAUSE"],
+        max_batches=max_batches,
+        peak_hours=peak_hours,
+        lock_timeout_ms=cfg["RETENTION_LOCK_TIMEOUT_MS"],
+        force=force,
+    )
+    click.echo(f"archived {result.sessions} sessions, {result.logs} focus_logs in {result.batches} batches")
+    if result.stopped:
+        click.echo(f"stopped early: {result.stopped}", err=True)
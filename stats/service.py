@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from main.db import db
+from models.focus import FocusLog, FocusLogArchive, UserDailyFocus, RoomUserDailyFocus
+from models.user import User
+
+
+def _insert(model):
+    """Dialect-specific INSERT so we can upsert on Postgres and SQLite."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"rollup upsert not supported on {dialect}")
+    return insert(model)
+
+
+def _upsert(model, keys: Tuple[str, ...], rows: List[Dict]) -> None:
+    stmt = _insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            "focused_seconds": model.focused_seconds + stmt.excluded.focused_seconds,
+            "session_count": model.session_count + stmt.excluded.session_count,
+        },
+    )
+    db.session.execute(stmt)
+
+
+def record_focus(logs: Iterable[Dict], day: date) -> None:
+    """
+    Fold freshly inserted focus_logs rows (dicts with user_id, room_id,
+    focused_seconds) into the daily rollups: one upsert per table.
+    Runs inside the caller's transaction; the caller commits.
+    """
+    per_user: Dict[int, List[int]] = {}
+    per_room_user: Dict[Tuple[int, int], List[int]] = {}
+    for log in logs:
+        u = per_user.setdefault(log["user_id"], [0, 0])
+        u[0] += log["focused_seconds"]
+        u[1] += 1
+        r = per_room_user.setdefault((log["room_id"], log["user_id"]), [0, 0])
+        r[0] += log["focused_seconds"]
+        r[1] += 1
+
+    if not per_user:
+        return
+
+    _upsert(UserDailyFocus, ("user_id", "day"), [
+        {"user_id": uid, "day": day, "focused_seconds": secs, "session_count": n}
+        for uid, (secs, n) in per_user.items()
+    ])
+    _upsert(RoomUserDailyFocus, ("room_id", "day", "user_id"), [
+        {"room_id": rid, "user_id": uid, "day": day, "focused_seconds": secs, "session_count": n}
+        for (rid, uid), (secs, n) in per_room_user.items()
+    ])
+
+
+def get_user_history(user_id: int, days: int) -> List[Dict]:
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = (
+        db.session.query(UserDailyFocus.day, UserDailyFocus.focused_seconds, UserDailyFocus.session_count)
+        .filter(UserDailyFocus.user_id == user_id, UserDailyFocus.day >= since)
+        .order_by(UserDailyFocus.day.asc())
+        .all()
+    )
+    return [
+        {"day": d.isoformat(), "focused_seconds": secs, "session_count": n}
+        for d, secs, n in rows
+    ]
+
+
+def get_room_leaderboard(room_id: int, days: int, limit: int = 10) -> List[Dict]:
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    total = db.func.sum(RoomUserDailyFocus.focused_seconds).label("focused_seconds")
+    sub = (
+        db.session.query(
+            RoomUserDailyFocus.user_id,
+            total,
+            db.func.sum(RoomUserDailyFocus.session_count).label("session_count"),
+        )
+        .filter(RoomUserDailyFocus.room_id == room_id, RoomUserDailyFocus.day >= since)
+        .group_by(RoomUserDailyFocus.user_id)
+        .order_by(total.desc())
+        .limit(limit)
+        .subquery()
+    )
+    rows = (
+        db.session.query(sub.c.user_id, User.username, sub.c.focused_seconds, sub.c.session_count)
+        .join(User, User.id == sub.c.user_id)
+        .order_by(sub.c.focused_seconds.desc(), sub.c.user_id.asc())
+        .all()
+    )
+    return [
+        {"user_id": uid, "username": uname, "focused_seconds": int(secs), "session_count": int(n)}
+        for uid, uname, secs, n in rows
+    ]
+
+
+def backfill_rollups() -> Tuple[int, int]:
+    """
+    Rebuild both rollup tables from focus_logs (and focus_logs_archive,
+    so archived history still counts) with two INSERT ... SELECTs.
+    """
+    cols = ("user_id", "room_id", "focused_seconds", "created_at")
+    logs = db.union_all(
+        db.select(*(getattr(FocusLog, c) for c in cols)),
+        db.select(*(getattr(FocusLogArchive, c) for c in cols)),
+    ).subquery()
+    day = db.func.date(logs.c.created_at)
+
+    UserDailyFocus.query.delete()
+    RoomUserDailyFocus.query.delete()
+
+    db.session.execute(
+        db.insert(UserDailyFocus).from_select(
+            ["user_id", "day", "focused_seconds", "session_count"],
+            db.select(logs.c.user_id, day, db.func.sum(logs.c.focused_seconds), db.func.count())
+            .group_by(logs.c.user_id, day),
+        )
+    )
+    db.session.execute(
+        db.insert(RoomUserDailyFocus).from_select(
+            ["room_id", "day", "user_id", "focused_seconds", "session_count"],
+            db.select(logs.c.room_id, day, logs.c.user_id, db.func.sum(logs.c.focused_seconds), db.func.count())
+            .group_by(logs.c.room_id, day, logs.c.user_id),
+        )
+    )
+    db.session.commit()
+
+    return UserDailyFocus.query.count(), RoomUserDailyFocus.query.count()
@@ -0,0 +1,2 @@
+"""gunicorn entry point: gunicorn -c gunicorn.conf.py wsgi:app"""
+from app import app  # noqa: F401  (app.py applies gevent's monkey patching first)